@@ -0,0 +1,448 @@
+#!/usr/bin/env python
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import synthetic_traces
+
+'''
+Times every src and figures processor end to end on synthetic traces.
+
+For each trace size, writes a raw latency trace and raw fairness
+traces (@see synthetic_traces), runs every src processor on them, in
+each intermediate format, and then runs every figures processor on
+the src outputs.  Each job runs as its own generate.py process, so
+its timing includes starting python and importing what it needs, just
+as in real use.  Per job, records:
+
+    wall_seconds --- best wall time over --repeat runs.
+    cpu_seconds --- user plus system cpu time of that run.
+    peak_rss_kb --- largest resident set size of any run.
+    trace_ops_per_second --- ops in the synthetic trace that the
+    job's input came from, divided by wall_seconds.
+
+Results are saved as json, so runs on different commits can be
+compared with --compare.
+
+Usage:
+    python benchmark.py --output results.json --sizes 1e4,1e5,1e6
+    python benchmark.py --output new.json --compare results.json
+'''
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCHMARK_DIR),'src')
+FIGURES_DIR = os.path.join(os.path.dirname(BENCHMARK_DIR),'figures')
+
+DEFAULT_SIZE_LIST = [10 ** 4,10 ** 5,10 ** 6]
+DEFAULT_NUM_SWITCHES = 4
+OUTPUT_FORMAT_LIST = ['text','binary']
+
+# Raw traces get parsed into a binary sidecar on first read (@see
+# src/util/trace_cache).  Unless kept, sidecars are removed before
+# every src run, so that runs time parsing.
+TRACE_CACHE_SUFFIX = '.tscache'
+
+
+def run():
+    args = parse_args()
+    shape = synthetic_traces.TraceShape(
+        args.ops_per_second,args.jitter,args.warmup_fraction,
+        args.warmup_slowdown,args.seed)
+
+    work_dir = args.work_dir
+    if work_dir is None:
+        work_dir = tempfile.mkdtemp(prefix='sergeant_benchmark_')
+    elif not os.path.isdir(work_dir):
+        os.makedirs(work_dir)
+
+    result_list = []
+    try:
+        for size in args.size_list:
+            trace_dict = write_traces(work_dir,size,args.num_switches,shape)
+            for output_format in args.output_format_list:
+                for tree_dir, job in iter_jobs(
+                        work_dir,size,trace_dict,args.num_switches,
+                        output_format):
+                    result = time_job(
+                        work_dir,tree_dir,job,args.repeat,
+                        args.keep_trace_cache)
+                    result['size'] = size
+                    result['output_format'] = output_format
+                    result['trace_ops_per_second'] = (
+                        size / result['wall_seconds'])
+                    result_list.append(result)
+                    print_result(result)
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir,ignore_errors=True)
+
+    report = {
+        'commit': git_commit(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'num_switches': args.num_switches,
+        'shape': shape.to_dict(),
+        'repeat': args.repeat,
+        'keep_trace_cache': args.keep_trace_cache,
+        'result_list': result_list,
+        }
+    with open(args.output,'w') as fd:
+        json.dump(report,fd,indent=1,sort_keys=True)
+
+    failed_list = [
+        result for result in result_list if not result['succeeded']]
+    if len(failed_list) != 0:
+        print '\n%i of %i jobs failed.\n' % (
+            len(failed_list),len(result_list))
+        sys.exit(-1)
+
+    if args.compare is not None:
+        with open(args.compare,'r') as fd:
+            old_report = json.load(fd)
+        slowdown_list = compare(old_report['result_list'],result_list)
+        if ((args.max_slowdown is not None) and
+            any(slowdown > args.max_slowdown for slowdown in slowdown_list)):
+            print '\nSome jobs slowed down by more than %sx.\n' % (
+                args.max_slowdown,)
+            sys.exit(-1)
+
+
+def write_traces(work_dir,size,num_switches,shape):
+    '''
+    @returns {dict} --- 'latency' points to the name of a raw latency
+    trace with size ops.  'ralph' and 'wound_wait' point to names of
+    raw fairness traces with size ops each.
+    '''
+    trace_dict = {
+        'latency': os.path.join(work_dir,'trace_%i.txt' % size),
+        'ralph': os.path.join(work_dir,'fair_r_%i.txt' % size),
+        'wound_wait': os.path.join(work_dir,'fair_w_%i.txt' % size),
+        }
+    start = time.time()
+    # A job's peak rss counts whatever this process had resident when
+    # it forked the job: write traces in a process of their own.
+    process = multiprocessing.Process(
+        target=_write_traces,args=(trace_dict,size,num_switches,shape))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        print '\nCould not write traces of %i ops.\n' % size
+        assert False
+    print 'Wrote traces of %i ops in %.1fs' % (size,time.time() - start)
+    return trace_dict
+
+
+def _write_traces(trace_dict,size,num_switches,shape):
+    synthetic_traces.write_latency_trace(
+        trace_dict['latency'],size,num_switches,shape)
+    synthetic_traces.write_fairness_trace(trace_dict['ralph'],size,shape)
+    # wound-wait lets one principal get ahead of the other
+    synthetic_traces.write_fairness_trace(
+        trace_dict['wound_wait'],size,shape,principal_b_share=.7)
+
+
+def iter_jobs(work_dir,size,trace_dict,num_switches,output_format):
+    '''
+    @returns {generator} --- Yields (a,b) tuples in the order the jobs
+    must run: a is the directory of the generate.py that runs the job,
+    b is the job's configuration.  Every src job comes before the
+    figures jobs that read its output.
+    '''
+    extension = '.txt' if output_format == 'text' else '.bin'
+
+    def intermediate(name):
+        return os.path.join(work_dir,'%s_%i%s' % (name,size,extension))
+
+    def figure(name,figure_extension):
+        return os.path.join(
+            work_dir,'fig_%s_%i_%s%s' % (
+                name,size,output_format,figure_extension))
+
+    latency_trace = trace_dict['latency']
+    switch_tuple_list = [
+        {'num_switches': num_switches,'filename': latency_trace}]
+    src_job_list = [
+        ('single.read_only',
+         {'latency_filename': latency_trace,
+          'output_filename': intermediate('ro')}),
+        ('single.latency_contention',
+         {'input_tuple_list': switch_tuple_list,
+          'output_filename': intermediate('lc')}),
+        ('single.latency_rtt',
+         {'input_tuple_list': [
+             {'delay_us': 4,'filename': latency_trace}],
+          'output_filename': intermediate('rtt')}),
+        ('single.throughput',
+         {'input_tuple_list': switch_tuple_list,
+          'output_filename': intermediate('tp')}),
+        ('dist.latency',
+         {'latency_filename': latency_trace,
+          'output_filename': intermediate('dl')}),
+        ('dist.throughput',
+         {'input_tuple_list': switch_tuple_list,
+          'output_filename': intermediate('dtp')}),
+        ]
+    for name, args in src_job_list:
+        args['output_format'] = output_format
+        yield SRC_DIR, {'name': name,'args': args}
+
+    # fairness processors only write text
+    fairness_tuple_list = [
+        {'wound_wait_on': False,'filename': trace_dict['ralph']},
+        {'wound_wait_on': True,'filename': trace_dict['wound_wait']}]
+    if output_format == 'text':
+        for name, output_name in [
+                ('single.fairness','fair'),('dist.fairness','dfair')]:
+            yield SRC_DIR, {
+                'name': name,
+                'args': {
+                    'input_tuple_list': fairness_tuple_list,
+                    'output_filename': intermediate(output_name)}}
+
+    figures_job_list = [
+        ('single_node.read_only',
+         {'input_filename': intermediate('ro'),
+          'output_filename': figure('ro','.txt')}),
+        ('single_node.latency_contention',
+         {'input_filename': intermediate('lc'),
+          'output_filename': figure('lc','.png')}),
+        ('single_node.latency_rtt',
+         {'input_filename': intermediate('rtt'),
+          'output_filename': figure('rtt','.txt')}),
+        ('single_node.throughput',
+         {'input_filename': intermediate('tp'),
+          'output_filename': figure('tp','.png'),
+          'xlabel': 'Switches'}),
+        ('dist.latency',
+         {'input_tree_filename': intermediate('dl'),
+          'input_linear_filename': intermediate('dl'),
+          'output_filename': figure('dl','.txt')}),
+        ('dist.speculative_latency',
+         {'input_speculation_on_filename': intermediate('dl'),
+          'input_speculation_off_filename': intermediate('ro'),
+          'output_filename': figure('spec','.txt')}),
+        ('dist.throughput',
+         {'input_filename': intermediate('dtp'),
+          'output_filename': figure('dtp','.png')}),
+        ]
+    if output_format == 'text':
+        figures_job_list.extend([
+            ('single_node.fairness',
+             {'input_filename': intermediate('fair'),
+              'output_filename': figure('fair','.png'),
+              'ralph_algo': True}),
+            ('single_node.fairness_metrics',
+             {'input_filename': intermediate('fair'),
+              'output_filename': figure('fmet','.txt')}),
+            ])
+    for name, args in figures_job_list:
+        yield FIGURES_DIR, {'name': name,'args': args}
+
+
+def time_job(work_dir,tree_dir,job,repeat,keep_trace_cache):
+    '''
+    Runs job repeat times, each in a fresh generate.py process.
+
+    @returns {dict} --- Describes the runs.  @see module docstring.
+    '''
+    cfg_filename = os.path.join(work_dir,'benchmark_job.json')
+    with open(cfg_filename,'w') as fd:
+        json.dump([job],fd)
+
+    input_filename_list = _input_filenames(job['args'])
+    wall_seconds_list = []
+    cpu_seconds_list = []
+    peak_rss_kb = 0
+    succeeded = True
+    for i in range(0,repeat):
+        if not keep_trace_cache:
+            for input_filename in input_filename_list:
+                cache_filename = input_filename + TRACE_CACHE_SUFFIX
+                if os.path.exists(cache_filename):
+                    os.remove(cache_filename)
+
+        start = time.time()
+        process = subprocess.Popen(
+            [sys.executable,'generate.py','--cfg',cfg_filename,'--force'],
+            cwd=tree_dir)
+        # unlike Popen.wait, also reports the process's resource usage
+        status, rusage = os.wait4(process.pid,0)[1:]
+        # already reaped: keep Popen from waiting on it again
+        process.returncode = status
+        wall_seconds_list.append(time.time() - start)
+        cpu_seconds_list.append(rusage.ru_utime + rusage.ru_stime)
+        # kilobytes on linux
+        peak_rss_kb = max(peak_rss_kb,rusage.ru_maxrss)
+        if status != 0:
+            succeeded = False
+            break
+
+    best = wall_seconds_list.index(min(wall_seconds_list))
+    return {
+        'tree': os.path.basename(tree_dir),
+        'processor': job['name'],
+        'succeeded': succeeded,
+        'input_bytes': sum(
+            os.path.getsize(input_filename)
+            for input_filename in input_filename_list),
+        'wall_seconds': wall_seconds_list[best],
+        'wall_seconds_list': wall_seconds_list,
+        'cpu_seconds': cpu_seconds_list[best],
+        'peak_rss_kb': peak_rss_kb,
+        }
+
+
+def _input_filenames(job_args):
+    '''
+    @returns {list} --- Names of every file that a job with
+    arguments job_args reads.
+    '''
+    input_filename_list = []
+    for key, value in sorted(job_args.items()):
+        if key == 'input_tuple_list':
+            input_filename_list.extend(
+                input_tuple['filename'] for input_tuple in value)
+        elif key.endswith('filename') and (not key.startswith('output')):
+            input_filename_list.append(value)
+    # dist.latency can read the same file twice
+    return sorted(set(input_filename_list))
+
+
+def print_result(result):
+    print '%-7s %-31s %-6s %10i ops %9.3fs %9.3fs cpu %8i KB %s' % (
+        result['tree'],result['processor'],result['output_format'],
+        result['size'],result['wall_seconds'],result['cpu_seconds'],
+        result['peak_rss_kb'],
+        '' if result['succeeded'] else 'FAILED')
+
+
+def compare(old_result_list,new_result_list):
+    '''
+    Prints the wall time of every job in both result lists, and how
+    many times slower it got.
+
+    @returns {list} --- Each element is a float: new wall time over
+    old wall time of a job in both lists.
+    '''
+    def key(result):
+        return (result['size'],result['tree'],result['processor'],
+                result['output_format'])
+    old_result_dict = dict(
+        (key(result),result) for result in old_result_list)
+
+    slowdown_list = []
+    print '\n%-7s %-31s %-6s %10s %9s %9s %8s' % (
+        'tree','processor','format','ops','old','new','slowdown')
+    for new_result in new_result_list:
+        old_result = old_result_dict.get(key(new_result),None)
+        if old_result is None:
+            continue
+        slowdown = new_result['wall_seconds'] / old_result['wall_seconds']
+        slowdown_list.append(slowdown)
+        print '%-7s %-31s %-6s %10i %8.3fs %8.3fs %7.2fx' % (
+            new_result['tree'],new_result['processor'],
+            new_result['output_format'],new_result['size'],
+            old_result['wall_seconds'],new_result['wall_seconds'],
+            slowdown)
+    return slowdown_list
+
+
+def git_commit():
+    '''
+    @returns {String or None} --- Commit that the benchmarked code is
+    at, or None if not in a git repository.
+    '''
+    try:
+        with open(os.devnull,'w') as devnull:
+            return subprocess.check_output(
+                ['git','rev-parse','HEAD'],cwd=BENCHMARK_DIR,
+                stderr=devnull).strip()
+    except (OSError,subprocess.CalledProcessError):
+        return None
+
+
+def parse_args():
+    description_string = '''
+Use this script to time every processor on synthetic traces.
+'''
+    parser = argparse.ArgumentParser(description=description_string)
+    parser.add_argument(
+        '--output',
+        help='Json filename to save results to')
+    parser.add_argument(
+        '--sizes',default=','.join(map(str,DEFAULT_SIZE_LIST)),
+        help='Comma-separated numbers of ops per trace (eg., 1e4,1e8)')
+    parser.add_argument(
+        '--num-switches',type=int,default=DEFAULT_NUM_SWITCHES,
+        help='Number of switches in each latency trace')
+    parser.add_argument(
+        '--ops-per-second',type=float,
+        default=synthetic_traces.DEFAULT_OPS_PER_SECOND,
+        help='Rate at which each switch commits ops after warmup')
+    parser.add_argument(
+        '--jitter',type=float,default=synthetic_traces.DEFAULT_JITTER,
+        help='Standard deviation of gaps between ops over their mean')
+    parser.add_argument(
+        '--warmup-fraction',type=float,
+        default=synthetic_traces.DEFAULT_WARMUP_FRACTION,
+        help='Fraction of each switch\'s ops slowed down by warmup')
+    parser.add_argument(
+        '--warmup-slowdown',type=float,
+        default=synthetic_traces.DEFAULT_WARMUP_SLOWDOWN,
+        help='How many times longer than normal the first gap is')
+    parser.add_argument(
+        '--seed',type=int,default=0,
+        help='Seed of the random gaps and principals of traces')
+    parser.add_argument(
+        '--formats',default=','.join(OUTPUT_FORMAT_LIST),
+        help='Comma-separated intermediate formats (text, binary)')
+    parser.add_argument(
+        '--repeat',type=int,default=1,
+        help='Number of times to run each job; the fastest run counts')
+    parser.add_argument(
+        '--keep-trace-cache',action='store_true',
+        help='Reuse parsed raw traces across runs instead of reparsing')
+    parser.add_argument(
+        '--work-dir',
+        help='Directory to keep traces and outputs in.  Defaults to a '
+        'temporary directory that gets removed.')
+    parser.add_argument(
+        '--compare',
+        help='Json results of an earlier run to compare against')
+    parser.add_argument(
+        '--max-slowdown',type=float,
+        help='With --compare, fail if any job got this many times slower')
+    args = parser.parse_args()
+
+    if args.output is None:
+        print '\nRequire an output filename.\n'
+        sys.exit(-1)
+
+    args.size_list = [int(float(size)) for size in args.sizes.split(',')]
+    args.output_format_list = args.formats.split(',')
+    if any(output_format not in OUTPUT_FORMAT_LIST
+           for output_format in args.output_format_list):
+        print '\nFormats must be among %s.\n' % (
+            ', '.join(OUTPUT_FORMAT_LIST),)
+        sys.exit(-1)
+
+    if args.repeat < 1:
+        print '\n--repeat must be at least 1.\n'
+        sys.exit(-1)
+
+    if args.num_switches < 1:
+        print '\n--num-switches must be at least 1.\n'
+        sys.exit(-1)
+
+    return args
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,179 @@
+import itertools
+
+import numpy
+
+'''
+Writes synthetic traces in the formats that Sergeant experiments
+produce, so that processors can be timed on inputs of any size.
+
+Latency traces have a line per switch of comma-separated ns
+timestamps, one per committed op (@see
+src/util/file_readers.read_latencies).  Fairness traces have a single
+line of <which principal ran>|<ns timestamp when ran> entries, each
+followed by a comma (@see src/modules/single_node.FairnessProcessor).
+
+Gaps between successive ops are gamma distributed around the mean that
+gives ops_per_second, with coefficient of variation jitter.  To mimic
+the jit compiler warming up, gaps over the first warmup_fraction of
+each switch's ops start warmup_slowdown times as long and shrink
+linearly to normal.
+
+Traces are generated and written a chunk at a time, so writing 10^8
+ops takes no more memory than writing 10^6.
+'''
+
+NS_PER_SECOND = 1000000000.
+
+# Number of ops generated and written at a time.
+CHUNK_LENGTH = 1 << 20
+
+DEFAULT_OPS_PER_SECOND = 1000.
+DEFAULT_JITTER = .3
+DEFAULT_WARMUP_FRACTION = .2
+DEFAULT_WARMUP_SLOWDOWN = 3.
+
+# Switches do not all start at the same time: each starts up to this
+# long after the first.
+MAX_START_OFFSET_NS = 10000000
+
+
+class TraceShape(object):
+    def __init__(self,ops_per_second=DEFAULT_OPS_PER_SECOND,
+                 jitter=DEFAULT_JITTER,
+                 warmup_fraction=DEFAULT_WARMUP_FRACTION,
+                 warmup_slowdown=DEFAULT_WARMUP_SLOWDOWN,seed=0):
+        '''
+        @param {float} ops_per_second --- Rate at which each switch (or
+        the fairness trace's system) commits ops once warmed up.
+
+        @param {float} jitter --- Non-negative.  Standard deviation of
+        the gaps between ops, as a fraction of their mean.  0 gives
+        evenly spaced ops.
+
+        @param {float} warmup_fraction --- 0 to 1.  Fraction of each
+        switch's ops that are slowed down by warmup.
+
+        @param {float} warmup_slowdown --- At least 1.  How many times
+        longer than normal the very first gap is.
+
+        @param {int} seed --- Traces with the same shape, seed and
+        size are identical.
+        '''
+        if ops_per_second <= 0:
+            print '\nops_per_second must be positive.\n'
+            assert False
+        if jitter < 0:
+            print '\njitter cannot be negative.\n'
+            assert False
+        if (warmup_fraction < 0) or (warmup_fraction > 1):
+            print '\nwarmup_fraction must be between 0 and 1.\n'
+            assert False
+        if warmup_slowdown < 1:
+            print '\nwarmup_slowdown must be at least 1.\n'
+            assert False
+
+        self.ops_per_second = ops_per_second
+        self.jitter = jitter
+        self.warmup_fraction = warmup_fraction
+        self.warmup_slowdown = warmup_slowdown
+        self.seed = seed
+
+    def to_dict(self):
+        return {
+            'ops_per_second': self.ops_per_second,
+            'jitter': self.jitter,
+            'warmup_fraction': self.warmup_fraction,
+            'warmup_slowdown': self.warmup_slowdown,
+            'seed': self.seed,
+            }
+
+    def iter_timestamp_chunks(self,num_ops,random_state,start_ns=0):
+        '''
+        @param {int} num_ops --- Number of timestamps to generate.
+
+        @param {numpy.random.RandomState} random_state --- Source of
+        gaps between ops.
+
+        @param {int} start_ns --- Timestamp of the first op.
+
+        @returns {generator} --- Yields increasing int64 arrays of ns
+        timestamps, at most CHUNK_LENGTH at a time, num_ops in all.
+        '''
+        mean_gap_ns = NS_PER_SECOND / self.ops_per_second
+        num_warmup_ops = int(num_ops * self.warmup_fraction)
+        last_ns = start_ns - mean_gap_ns
+        for chunk_start in xrange(0,num_ops,CHUNK_LENGTH):
+            chunk_length = min(CHUNK_LENGTH,num_ops - chunk_start)
+            if self.jitter == 0:
+                gap_array_ns = numpy.repeat(mean_gap_ns,chunk_length)
+            else:
+                shape = 1. / self.jitter ** 2
+                gap_array_ns = random_state.gamma(
+                    shape,mean_gap_ns / shape,chunk_length)
+
+            if chunk_start < num_warmup_ops:
+                # slowdown shrinks linearly from warmup_slowdown to 1
+                index_array = numpy.arange(
+                    chunk_start,chunk_start + chunk_length)
+                slowdown_array = 1. + (
+                    (self.warmup_slowdown - 1.) *
+                    numpy.maximum(
+                        1. - index_array / float(num_warmup_ops),0.))
+                gap_array_ns *= slowdown_array
+
+            # every op takes at least 1 ns
+            timestamp_array_ns = last_ns + numpy.cumsum(
+                numpy.maximum(numpy.round(gap_array_ns),1.))
+            last_ns = timestamp_array_ns[-1]
+            yield timestamp_array_ns.astype(numpy.int64)
+
+
+def write_latency_trace(filename,num_ops,num_switches,shape):
+    '''
+    @param {String} filename --- Raw latency trace to write.
+
+    @param {int} num_ops --- Total number of ops, split as evenly as
+    possible between switches.
+
+    @param {int} num_switches --- Number of lines in the trace.
+
+    @param {TraceShape} shape --- Rate, jitter and warmup of ops.
+    '''
+    random_state = numpy.random.RandomState(shape.seed)
+    with open(filename,'w') as fd:
+        for switch_index in range(0,num_switches):
+            num_switch_ops = (
+                num_ops // num_switches +
+                (1 if switch_index < num_ops % num_switches else 0))
+            start_ns = random_state.randint(0,MAX_START_OFFSET_NS)
+            separator = ''
+            for timestamp_array_ns in shape.iter_timestamp_chunks(
+                    num_switch_ops,random_state,start_ns):
+                fd.write(separator)
+                fd.write(','.join(map(str,timestamp_array_ns.tolist())))
+                separator = ','
+            fd.write('\n')
+
+
+def write_fairness_trace(filename,num_ops,shape,principal_b_share=.5):
+    '''
+    @param {String} filename --- Raw fairness trace to write.
+
+    @param {int} num_ops --- Number of ops run by either principal.
+
+    @param {TraceShape} shape --- Rate, jitter and warmup of ops.
+
+    @param {float} principal_b_share --- 0 to 1.  Chance that each op
+    is run by principal b (1) instead of principal a (0).
+    '''
+    random_state = numpy.random.RandomState(shape.seed)
+    with open(filename,'w') as fd:
+        for timestamp_array_ns in shape.iter_timestamp_chunks(
+                num_ops,random_state):
+            principal_array = (
+                random_state.random_sample(len(timestamp_array_ns)) <
+                principal_b_share).astype(numpy.int64)
+            fd.write(''.join(
+                ['%i|%i,' % entry for entry in itertools.izip(
+                    principal_array.tolist(),
+                    timestamp_array_ns.tolist())]))
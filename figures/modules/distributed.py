@@ -1,7 +1,9 @@
 import os
 
 from util.file_readers import read_throughput_file, read_latency_file
+from util.file_readers import read_latency_summary_file
 import util.plotters as plotters
+from util.atomic_output import atomic_open
 from modules import register_processor
 
 
@@ -43,6 +45,10 @@ class SpeculativeLatency(object):
             "output_filename": {String} name of file to output,
             "input_speculation_on_filename": {String} name of file to input from
             "input_speculation_off_filename": {String} name of file to input from
+            "sketch_relative_error": {float} optional.  If set,
+                summarize latencies in sketches with this relative
+                error instead of reading them all into memory (@see
+                util.latency_sketch).
         }
         '''
         output_filename = kwargs.get('output_filename',None)
@@ -56,8 +62,11 @@ class SpeculativeLatency(object):
             (input_speculation_off_filename is None)):
             assert False
 
-        speculation_latency_list = read_latency_file(input_speculation_on_filename)
-        no_speculation_latency_list = read_latency_file(input_speculation_off_filename)
+        sketch_relative_error = kwargs.get('sketch_relative_error',None)
+        speculation_latency_list = read_latency_summary_file(
+            input_speculation_on_filename,sketch_relative_error)
+        no_speculation_latency_list = read_latency_summary_file(
+            input_speculation_off_filename,sketch_relative_error)
 
         if ((len(speculation_latency_list) != 1) or
             (len(no_speculation_latency_list) != 1)):
@@ -68,25 +77,31 @@ class SpeculativeLatency(object):
         speculation_latency_result = speculation_latency_list[0]
         no_speculation_latency_result = no_speculation_latency_list[0]
 
-        with open(output_filename,'w') as fd:
+        # each result's latencies are sorted once for all three
+        speculation_percentile_list = (
+            speculation_latency_result.percentiles_latency_ms([5,50,95]))
+        no_speculation_percentile_list = (
+            no_speculation_latency_result.percentiles_latency_ms([5,50,95]))
+
+        with atomic_open(output_filename) as fd:
             fd.write('Speculation 5th latnecy (ms): ')
-            fd.write(str(speculation_latency_result.percentile_latency_ms(5)))
+            fd.write(str(speculation_percentile_list[0]))
             fd.write('\n')
             fd.write('Speculation median latnecy (ms): ')
-            fd.write(str(speculation_latency_result.median_latency_ms()))
+            fd.write(str(speculation_percentile_list[1]))
             fd.write('\n')
             fd.write('Speculation 95th latnecy (ms): ')
-            fd.write(str(speculation_latency_result.percentile_latency_ms(95)))
+            fd.write(str(speculation_percentile_list[2]))
             fd.write('\n')
             fd.write('\n')
             fd.write('No speculation 5th latnecy (ms): ')
-            fd.write(str(no_speculation_latency_result.percentile_latency_ms(5)))
+            fd.write(str(no_speculation_percentile_list[0]))
             fd.write('\n')
             fd.write('No speculation median latnecy (ms): ')
-            fd.write(str(no_speculation_latency_result.median_latency_ms()))
+            fd.write(str(no_speculation_percentile_list[1]))
             fd.write('\n')
             fd.write('No speculation 95th latnecy (ms): ')
-            fd.write(str(no_speculation_latency_result.percentile_latency_ms(95)))
+            fd.write(str(no_speculation_percentile_list[2]))
             fd.write('\n')
 
 @register_processor
@@ -101,6 +116,10 @@ class Latency(object):
             "output_filename": {String} name of file to output,
             "input_tree_filename": {String} name of file to input from
             "input_linear_filename": {String} name of file to input from
+            "sketch_relative_error": {float} optional.  If set,
+                summarize latencies in sketches with this relative
+                error instead of reading them all into memory (@see
+                util.latency_sketch).
         }
         '''
 
@@ -114,8 +133,11 @@ class Latency(object):
             assert False
         
         # each should only have a single entry in it.  Check
-        tree_latency_list = read_latency_file(input_filename_tree)
-        linear_latency_list = read_latency_file(input_filename_linear)
+        sketch_relative_error = kwargs.get('sketch_relative_error',None)
+        tree_latency_list = read_latency_summary_file(
+            input_filename_tree,sketch_relative_error)
+        linear_latency_list = read_latency_summary_file(
+            input_filename_linear,sketch_relative_error)
 
         if (len(tree_latency_list) != 1) or (len(linear_latency_list) != 1):
             print (
@@ -126,7 +148,7 @@ class Latency(object):
         tree_latency_result = tree_latency_list[0]
         linear_latency_result = linear_latency_list[0]
 
-        with open(output_filename,'w') as fd:
+        with atomic_open(output_filename) as fd:
             fd.write('Tree median latnecy (ms): ')
             fd.write(str(tree_latency_result.median_latency_ms()))
             fd.write('\n')
@@ -1,3 +1,5 @@
+import importlib
+
 # Keys are strings, values are functions for processing data.  When we
 # encounter a key in our dictionary from reading the config file, the
 # value of the key are the arguments that get passed to the function.
@@ -5,6 +7,27 @@ _available_processor = {}
 def register_processor(cls):
     global available_proceses
     _available_processor[cls.NAME] = cls
+    return cls
     
+# Processor modules are only imported once a job names one of their
+# processors, so that a run only pays for the imports it uses.  Keys
+# are the part of a processor name before its first '.', values are
+# the module that registers those processors.
+_PROCESSOR_MODULE_DICT = {
+    'single_node': 'modules.single_node',
+    'dist': 'modules.distributed',
+    }
+
 def get_processor(processor_name):
+    '''
+    @returns {class or None} --- The processor registered as
+    processor_name, importing its module first if need be.  None if
+    there is no such processor.
+    '''
+    if ((processor_name not in _available_processor) and
+        isinstance(processor_name,basestring)):
+        module_name = _PROCESSOR_MODULE_DICT.get(
+            processor_name.split('.')[0],None)
+        if module_name is not None:
+            importlib.import_module(module_name)
     return _available_processor.get(processor_name,None)
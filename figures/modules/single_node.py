@@ -3,7 +3,14 @@ import os
 from util.file_readers import read_throughput_file, read_latency_file
 from util.file_readers import read_fairness_file, read_rtt_latency_file
 from util.file_readers import read_speculation_rtt_file
+from util.file_readers import read_latency_summary_file
+from util.file_readers import read_box_stats_file
+from util.latency_stats import LatencyStatsTable
+from util.file_readers import read_fairness_arrays
+from util.fairness_metrics import FairnessMetrics
+from util.fairness_metrics import DEFAULT_WINDOW_LENGTH_SECONDS
 import util.plotters as plotters
+from util.atomic_output import atomic_open
 import numpy
 from modules import register_processor
 
@@ -32,15 +39,17 @@ class LatencyRTTProcessor(object):
 
         # each element of this list is a 
         latency_list = read_rtt_latency_file(input_filename)
+        # medians of every rtt in one pass
+        median_list = LatencyStatsTable(latency_list).column('p50')
 
-        with open(output_filename,'w') as fd:
+        with atomic_open(output_filename) as fd:
             fd.write('Controller-switch RTT')
             fd.write('\t')
             fd.write('Median latency\n')
-            for latency_result in latency_list:
+            for latency_result, median in zip(latency_list,median_list):
                 fd.write(str(latency_result.artificial_rtt_ms))
                 fd.write('\t')
-                fd.write(str(latency_result.median_latency_ms()))
+                fd.write(str(median))
                 fd.write('\n')
 
 @register_processor
@@ -91,18 +100,32 @@ class LatencyContention(object):
                 'input_filename': {string} @see
                 util.file_readers.read_latency_file for expected
                 format of file named by input_filename.
+
+                'input_stats_filename': {string} use in place of
+                input_filename to draw boxes from precomputed
+                statistics.  @see util.file_readers.read_box_stats_file
+                for expected format of file named by
+                input_stats_filename.
             }
         '''
         output_filename = kwargs.get('output_filename',None)
         input_filename = kwargs.get('input_filename',None)
+        input_stats_filename = kwargs.get('input_stats_filename',None)
 
-        if (output_filename is None) or (input_filename is None):
+        if ((output_filename is None) or
+            ((input_filename is None) == (input_stats_filename is None))):
             assert False
-            
-        latency_list = read_latency_file(input_filename)
+
         ylabel = 'Program\nLatency(ms)'
         xlabel = 'Contending applications'
 
+        if input_stats_filename is not None:
+            latency_stats_list = read_box_stats_file(input_stats_filename)
+            plotters.box_and_whisker_latency_stats(
+                latency_stats_list,xlabel,ylabel,output_filename)
+            return
+
+        latency_list = read_latency_file(input_filename)
         plotters.box_and_whisker_latency(
             latency_list,xlabel,ylabel,output_filename)
             
@@ -121,6 +144,11 @@ class ReadOnly(object):
                 'input_filename': {string} @see
                 util.file_readers.read_latency_file for expected
                 format of file named by input_filename.
+
+                'sketch_relative_error': {float} optional.  If set,
+                summarize latencies in a sketch with this relative
+                error instead of reading them all into memory (@see
+                util.latency_sketch).
             }
         '''
         output_filename = kwargs.get('output_filename',None)
@@ -129,21 +157,21 @@ class ReadOnly(object):
         if (output_filename is None) or (input_filename is None):
             assert False
 
-        latency_list = read_latency_file(input_filename)
+        latency_list = read_latency_summary_file(
+            input_filename,kwargs.get('sketch_relative_error',None))
         # read only latency should only use one thread/switch
         if len(latency_list) != 1:
             print '\nError: read only latency has more entries than expected.\n'
             assert(False)
         latency_result = latency_list[0]
 
-        fifth_percentile = numpy.percentile(latency_result.latency_list_ms,5)
-        ninety_fifth_percentile = numpy.percentile(
-            latency_result.latency_list_ms,95)
-        median = numpy.percentile(latency_result.latency_list_ms,50)
-        average = numpy.average(latency_result.latency_list_ms)
-        stddev = numpy.std(latency_result.latency_list_ms)
+        # latencies are sorted once for all three
+        fifth_percentile, median, ninety_fifth_percentile = (
+            latency_result.percentiles_latency_ms([5,50,95]))
+        average = latency_result.average_latency_ms()
+        stddev = latency_result.stddev_latency_ms()
 
-        with open(output_filename,'w') as fd:
+        with atomic_open(output_filename) as fd:
             fd.write('Read only latencies (ms)\n')
             fd.write('5th percentile:\t%f\n' % fifth_percentile)
             fd.write('50th percentile:\t%f\n' % median)
@@ -191,3 +219,71 @@ class Fairness(object):
         ylabel = 'Share'
 
         plotters.fairness(fairness_list,xlabel,ylabel,output_filename)
+
+@register_processor
+class FairnessMetricsReport(object):
+    NAME = 'single_node.fairness_metrics'
+
+    @staticmethod
+    def run(**kwargs):
+        '''
+        Expected form of kwargs:
+            {
+                'output_filename': {string} the name of the file to save
+                the report to,
+
+                'input_filename': {string} @see
+                util.file_readers.read_fairness_arrays for expected
+                format of file named by input_filename.
+
+                'window_length_seconds': {float} optional.  Length of
+                the windows that Jain's fairness index is computed
+                over.  Defaults to 1.
+            }
+
+        Reports, for both ralph and wound-wait scheduling, each
+        principal's throughput and longest starvation gap, and Jain's
+        fairness index of each window (@see util.fairness_metrics).
+        '''
+        output_filename = kwargs.get('output_filename',None)
+        input_filename = kwargs.get('input_filename',None)
+        window_length_seconds = kwargs.get(
+            'window_length_seconds',DEFAULT_WINDOW_LENGTH_SECONDS)
+
+        if (output_filename is None) or (input_filename is None):
+            assert False
+
+        with atomic_open(output_filename) as fd:
+            for ralph_algo, algo_name in [(True,'Ralph'),(False,'Wound-wait')]:
+                principal_array, timestamp_array_ns = read_fairness_arrays(
+                    input_filename,ralph_algo)
+                fairness_metrics = FairnessMetrics(
+                    principal_array,timestamp_array_ns,window_length_seconds)
+
+                fd.write('%s\n' % algo_name)
+                fd.write(
+                    'Duration (s):\t%f\n' % fairness_metrics.duration_seconds)
+                for principal in range(0,fairness_metrics.num_principals):
+                    fd.write(
+                        'Principal %i throughput (ops/s):\t%f\n' %
+                        (principal,
+                         fairness_metrics.throughput_list[principal]))
+                    fd.write(
+                        'Principal %i longest starvation gap (ms):\t%f\n' %
+                        (principal,
+                         fairness_metrics.longest_gap_seconds_list[principal] *
+                         1000.))
+
+                jain_index_summary = fairness_metrics.jain_index_summary()
+                fd.write(
+                    'Jain\'s index over %f s windows:\n' %
+                    window_length_seconds)
+                fd.write('Mean:\t%f\n' % jain_index_summary['mean'])
+                fd.write('Min:\t%f\n' % jain_index_summary['min'])
+                fd.write('5th percentile:\t%f\n' % jain_index_summary['p5'])
+                fd.write('Window start (s)\tJain\'s index\n')
+                for window_start_seconds, jain_index in zip(
+                    fairness_metrics.window_start_array_seconds,
+                    fairness_metrics.jain_index_array):
+                    fd.write('%f\t%f\n' % (window_start_seconds,jain_index))
+                fd.write('\n')
@@ -0,0 +1,69 @@
+import numpy
+
+'''
+Summary statistics that are enough to draw a box and whisker plot of a
+set of numbers without keeping the numbers themselves.  They match
+matplotlib.cbook.boxplot_stats with its default whiskers, which reach
+the most extreme numbers within WHISKER_IQR_FACTOR interquartile ranges
+of the box.  Computing them takes linear time: nothing gets sorted.
+
+This module is shared, unchanged, between src and figures.
+'''
+
+WHISKER_IQR_FACTOR = 1.5
+
+# Order of the statistics in the arrays that box_stats returns and
+# that stats files hold, one row per set of numbers.
+STAT_NAME_LIST = [
+    'whislo','q1','med','q3','whishi','mean','min','max','count']
+
+
+def box_stats(values):
+    '''
+    @param {list or numpy.ndarray} values --- Numbers to summarize.
+
+    @returns {numpy.ndarray} --- float64 array with one element per
+    name in STAT_NAME_LIST.  All but count are nan if values is empty.
+    '''
+    values = numpy.asarray(values,dtype=numpy.float64)
+    if len(values) == 0:
+        to_return = numpy.empty(len(STAT_NAME_LIST))
+        to_return.fill(numpy.nan)
+        to_return[STAT_NAME_LIST.index('count')] = 0
+        return to_return
+
+    q1, median, q3 = numpy.percentile(values,[25,50,75])
+    iqr = q3 - q1
+
+    low_values = values[values >= q1 - WHISKER_IQR_FACTOR * iqr]
+    whisker_low = q1
+    if (len(low_values) != 0) and (low_values.min() <= q1):
+        whisker_low = low_values.min()
+    high_values = values[values <= q3 + WHISKER_IQR_FACTOR * iqr]
+    whisker_high = q3
+    if (len(high_values) != 0) and (high_values.max() >= q3):
+        whisker_high = high_values.max()
+
+    return numpy.array(
+        [whisker_low,q1,median,q3,whisker_high,values.mean(),
+         values.min(),values.max(),len(values)],
+        dtype=numpy.float64)
+
+
+def to_bxp_dict(stat_array,scale=1.):
+    '''
+    @param {numpy.ndarray} stat_array --- @see box_stats
+
+    @param {float} scale --- Every statistic but count gets multiplied
+    by scale, eg., to convert ns to ms.
+
+    @returns {dict} --- Describes one box, in the form that
+    matplotlib's Axes.bxp takes.  Has no fliers.
+    '''
+    to_return = {'fliers': []}
+    for stat_name, stat in zip(STAT_NAME_LIST,stat_array):
+        if stat_name == 'count':
+            to_return[stat_name] = int(stat)
+        else:
+            to_return[stat_name] = stat * scale
+    return to_return
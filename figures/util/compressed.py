@@ -0,0 +1,125 @@
+import bz2
+import contextlib
+import distutils.spawn
+import gzip
+import os
+import signal
+import subprocess
+
+'''
+Lets readers take gzip, bzip2 and xz compressed input files, by
+extension (.gz, .bz2, .xz), as if they were uncompressed.
+
+Files are decompressed as they are read, never to disk first, so
+readers must stream their input rather than memory-map it.  When a
+decompression command is installed (preferring parallel ones, eg.,
+pigz), it runs in its own process and streams into a pipe, so
+decompressing overlaps with parsing, on a cpu of its own.  Otherwise
+files are decompressed by python itself, which cannot read xz files
+(python 2 has no lzma module).
+'''
+
+# Decompressed data is read from pipes this many bytes at a time.
+PIPE_BUFFER_BYTES = 1 << 20
+
+
+class _Compression(object):
+    def __init__(self,command_list,python_open):
+        '''
+        @param {list} command_list --- Names of commands that print the
+        decompressed contents of the file named by their last argument
+        when given -dc, in order of preference.
+
+        @param {function or None} python_open --- Takes a file name,
+        returns a file object of its decompressed contents.  None if
+        python cannot decompress the format.
+        '''
+        self.command_list = command_list
+        self.python_open = python_open
+
+_COMPRESSION_DICT = {
+    '.gz': _Compression(['pigz','gzip'],gzip.open),
+    '.bz2': _Compression(['lbzip2','pbzip2','bzip2'],bz2.BZ2File),
+    '.xz': _Compression(['xz'],None),
+    }
+
+# command name -> full path of the command, or None if not installed
+_command_path_dict = {}
+
+
+def is_compressed(filename):
+    '''
+    @returns {bool} --- True if filename's extension is that of a
+    compressed file.
+    '''
+    return _compression(filename) is not None
+
+
+@contextlib.contextmanager
+def open_input(filename):
+    '''
+    Use in place of open(filename,'rb') for reading input files.
+
+    @returns {context manager} --- Yields a file object with the
+    decompressed contents of filename, or of filename itself if it is
+    not compressed.  Raises IOError on leaving the with block if the
+    file could not be decompressed.
+    '''
+    compression = _compression(filename)
+    if compression is None:
+        with open(filename,'rb') as fd:
+            yield fd
+        return
+
+    command_path = _find_command(compression.command_list)
+    if command_path is None:
+        if compression.python_open is None:
+            print (
+                '\nCannot decompress %s: install one of %s.\n' %
+                (filename,', '.join(compression.command_list)))
+            assert False
+        with contextlib.closing(compression.python_open(filename)) as fd:
+            yield fd
+        return
+
+    if not os.path.exists(filename):
+        raise IOError('No such file: %s' % filename)
+    process = subprocess.Popen(
+        [command_path,'-dc',filename],stdout=subprocess.PIPE,
+        bufsize=PIPE_BUFFER_BYTES,preexec_fn=_restore_sigpipe)
+    try:
+        yield process.stdout
+    except:
+        process.stdout.close()
+        process.wait()
+        raise
+    process.stdout.close()
+    # killed by SIGPIPE if the with block stopped reading early
+    if process.wait() not in [0,-signal.SIGPIPE]:
+        raise IOError(
+            'Could not decompress %s with %s' % (filename,command_path))
+
+
+def _compression(filename):
+    return _COMPRESSION_DICT.get(
+        os.path.splitext(filename)[1].lower(),None)
+
+
+def _find_command(command_list):
+    '''
+    @returns {String or None} --- Full path of the first command of
+    command_list that is installed, or None if none are.
+    '''
+    for command in command_list:
+        if command not in _command_path_dict:
+            _command_path_dict[command] = distutils.spawn.find_executable(
+                command)
+        if _command_path_dict[command] is not None:
+            return _command_path_dict[command]
+    return None
+
+
+def _restore_sigpipe():
+    # python ignores SIGPIPE, and children inherit that: let the
+    # decompressor stop quietly once its reader closes the pipe.
+    signal.signal(signal.SIGPIPE,signal.SIG_DFL)
@@ -0,0 +1,59 @@
+import numpy
+
+'''
+Shrinks a line's points to about as many as the plot can show.
+
+The points are split into one bucket per horizontal pixel of the
+plot, and only the lowest and the highest point of each bucket are
+kept, in their original order.  Every pixel column still spans the
+same vertical range, so the drawn line looks the same.  Drawing time
+and vector file size then depend on the plot's width instead of on
+the number of points.
+'''
+
+def min_max_downsample(y_data,num_buckets,x_data=None):
+    '''
+    @param {list or numpy.ndarray} y_data --- y value of each point,
+    in order of x.
+
+    @param {int} num_buckets --- Number of buckets to split the
+    points into, eg., the plot's width in pixels.
+
+    @param {list or numpy.ndarray or None} x_data --- x value of each
+    point, in ascending order.  None means 0, 1, 2, ...
+
+    @returns {2-tuple} (a,b) --- a is an array of the x values of the
+    points kept, b is an array of their y values.  At most
+    2 * num_buckets + 2 points are kept, including the first and last.
+    '''
+    y_array = numpy.asarray(y_data)
+    num_points = len(y_array)
+    if x_data is None:
+        x_array = numpy.arange(num_points)
+    else:
+        x_array = numpy.asarray(x_data)
+
+    if num_points <= 2 * num_buckets:
+        return x_array, y_array
+
+    bucket_length = -(-num_points // num_buckets)
+    num_full_buckets = num_points // bucket_length
+    full_matrix = y_array[:num_full_buckets * bucket_length].reshape(
+        num_full_buckets,bucket_length)
+    bucket_start_array = numpy.arange(num_full_buckets) * bucket_length
+    index_list = [
+        [0,num_points - 1],
+        bucket_start_array + full_matrix.argmin(axis=1),
+        bucket_start_array + full_matrix.argmax(axis=1)]
+
+    # points left over after the full buckets form one more bucket
+    tail_start = num_full_buckets * bucket_length
+    if tail_start < num_points:
+        tail_array = y_array[tail_start:]
+        index_list.append(
+            [tail_start + tail_array.argmin(),
+             tail_start + tail_array.argmax()])
+
+    # numpy.unique also sorts, which restores the original order
+    index_array = numpy.unique(numpy.concatenate(index_list))
+    return x_array[index_array], y_array[index_array]
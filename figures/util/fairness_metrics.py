@@ -0,0 +1,111 @@
+import numpy
+
+'''
+Time-based fairness of a fairness trace: how many ops each principal
+got done, how evenly ops were shared in each window of time (Jain's
+fairness index), and the longest each principal went without running.
+
+Everything is computed from cumulative op counts in time order, so
+the cost is linear in the number of ops plus the number of windows.
+'''
+
+NS_PER_SECOND = 1000000000.
+
+DEFAULT_WINDOW_LENGTH_SECONDS = 1.
+
+
+class FairnessMetrics(object):
+    def __init__(self,principal_array,timestamp_array_ns,
+                 window_length_seconds=DEFAULT_WINDOW_LENGTH_SECONDS,
+                 num_principals=2):
+        '''
+        @param {numpy.ndarray} principal_array --- Each element is the
+        id (0, 1, ...) of the principal that ran an op.
+
+        @param {numpy.ndarray} timestamp_array_ns --- Same length as
+        principal_array.  Each element is the ns timestamp when the
+        corresponding op ran.  @see
+        util.file_readers.read_fairness_arrays
+
+        @param {float} window_length_seconds --- Length of the windows
+        of time that Jain's index is computed over.  The last window
+        may be cut short by the end of the trace.
+
+        @param {int} num_principals --- Number of principals sharing
+        the system, including any that never ran.  Raised to one more
+        than the largest id in principal_array if need be.
+        '''
+        if len(principal_array) == 0:
+            print '\nCannot compute fairness of an empty trace.\n'
+            assert False
+
+        principal_array = numpy.asarray(principal_array)
+        timestamp_array_ns = numpy.asarray(
+            timestamp_array_ns,dtype=numpy.int64)
+        if numpy.any(numpy.diff(timestamp_array_ns) < 0):
+            order = numpy.argsort(timestamp_array_ns,kind='mergesort')
+            principal_array = principal_array[order]
+            timestamp_array_ns = timestamp_array_ns[order]
+
+        self.num_principals = max(
+            num_principals,int(principal_array.max()) + 1)
+        self.window_length_seconds = window_length_seconds
+        start_ns = timestamp_array_ns[0]
+        end_ns = timestamp_array_ns[-1]
+        self.duration_seconds = (end_ns - start_ns) / NS_PER_SECOND
+
+        window_length_ns = int(window_length_seconds * NS_PER_SECOND)
+        num_windows = (end_ns - start_ns) // window_length_ns + 1
+        edge_array_ns = (
+            start_ns + numpy.arange(num_windows + 1) * window_length_ns)
+        # number of ops that ran before each window edge
+        edge_index_array = numpy.searchsorted(
+            timestamp_array_ns,edge_array_ns,side='left')
+        self.window_start_array_seconds = (
+            (edge_array_ns[:-1] - start_ns) / NS_PER_SECOND)
+
+        count_list = []
+        self.longest_gap_seconds_list = []
+        window_count_matrix = numpy.empty((self.num_principals,num_windows))
+        for principal in range(0,self.num_principals):
+            is_principal = principal_array == principal
+            cumulative_count_array = numpy.concatenate(
+                ([0],numpy.cumsum(is_principal)))
+            count_list.append(cumulative_count_array[-1])
+            # ops of principal within each window
+            window_count_matrix[principal] = numpy.diff(
+                cumulative_count_array[edge_index_array])
+
+            # the trace's start and end bound the first and last gaps
+            principal_timestamp_array_ns = numpy.concatenate(
+                ([start_ns],timestamp_array_ns[is_principal],[end_ns]))
+            self.longest_gap_seconds_list.append(
+                numpy.diff(principal_timestamp_array_ns).max() /
+                NS_PER_SECOND)
+
+        self.count_list = [int(count) for count in count_list]
+        # ops/s over the whole trace
+        self.throughput_list = [
+            count / self.duration_seconds if self.duration_seconds > 0
+            else float('nan')
+            for count in self.count_list]
+
+        # (sum x)^2 / (n * sum x^2); nan for windows with no ops
+        sum_array = window_count_matrix.sum(axis=0)
+        sum_squares_array = (window_count_matrix ** 2).sum(axis=0)
+        with numpy.errstate(invalid='ignore',divide='ignore'):
+            self.jain_index_array = (
+                sum_array ** 2 / (self.num_principals * sum_squares_array))
+
+    def jain_index_summary(self):
+        '''
+        @returns {dict} --- Summarizes jain_index_array over windows
+        that had any ops: 'mean', 'min', and 'p5' (5th percentile).
+        '''
+        jain_index_array = self.jain_index_array[
+            ~numpy.isnan(self.jain_index_array)]
+        return {
+            'mean': jain_index_array.mean(),
+            'min': jain_index_array.min(),
+            'p5': numpy.percentile(jain_index_array,5),
+            }
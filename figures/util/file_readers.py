@@ -1,6 +1,32 @@
+import itertools
+import re
+import string
+
+import numpy
+
 from throughput_results import ThroughputResult
 from latency_result import LatencyResult
-
+from latency_sketch import LatencySketch, LatencySketchResult
+from latency_sketch import DEFAULT_RELATIVE_ERROR
+import compressed
+import instrumentation
+import pipeline
+import row_file
+import box_stats
+
+# Sketched rows are read this many bytes of text, or values of a
+# binary row file, at a time.
+BLOCK_SIZE_BYTES = 1 << 24
+CHUNK_LENGTH = 1 << 20
+
+# An entry that is empty or only whitespace, between two commas.
+_BLANK_ENTRY_REGEX = re.compile(r',\s*,')
+
+# The first number of each line of a fairness file (which algorithm
+# the line is for) is at most this many bytes long.
+_MAX_ALGO_BYTES = 64
+
+@instrumentation.in_phase(instrumentation.PARSE_PHASE)
 def read_speculation_rtt_file(input_filename):
     '''
     For anyware speculation latency data with artificial rtts
@@ -15,7 +41,9 @@ def read_speculation_rtt_file(input_filename):
     where the first number of a line is a 0 if speculation is off and
     a 1 if speculation is on; the second number of the file is the
     artificially added rtt (in ns); and subsequent numbers in the line
-    represent the time, in ns, that an op took.
+    represent the time, in ns, that an op took.  Can also be a binary
+    row file (@see util.row_file) whose keys are (speculation flag,
+    rtt).
 
     @returns {2-tuple} (a,b)
     
@@ -28,25 +56,34 @@ def read_speculation_rtt_file(input_filename):
     speculation_off_list = []
     speculation_on_list = []
 
-    with open(input_filename) as fd:
-        for line in fd:
-            line = line.strip()
-            token_list = line.split(',')
-
-            speculation_token = int(token_list[0])
-            rtt_token = int(token_list[1])
-            string_latencies = token_list[2:]
-
-            latencies_ns = map(
-                lambda string: int(string),
-                string_latencies)
-
-            latency_result = LatencyResult(1,latencies_ns,rtt_token)
-            # ugh: hard-coding here...
-            if speculation_token == 1:
-                speculation_on_list.append(latency_result)
-            else:
-                speculation_off_list.append(latency_result)
+    if row_file.is_row_file(input_filename):
+        # each row's key is (speculation flag, rtt)
+        row_list = [
+            (row_key[0],row_key[1],latencies_ns)
+            for row_key, latencies_ns in row_file.read_row_file(input_filename)]
+    else:
+        row_list = []
+        with compressed.open_input(input_filename) as fd:
+            for line in fd:
+                instrumentation.count(instrumentation.BYTES_READ,len(line))
+                if line.strip() == '':
+                    continue
+                number_array = _parse_numbers(line,numpy.int64)
+                instrumentation.count(
+                    instrumentation.VALUES_PARSED,len(number_array))
+
+                speculation_token = int(number_array[0])
+                rtt_token = int(number_array[1])
+                latencies_ns = number_array[2:]
+                row_list.append((speculation_token,rtt_token,latencies_ns))
+
+    for speculation_token, rtt_token, latencies_ns in row_list:
+        latency_result = LatencyResult(1,latencies_ns,rtt_token)
+        # ugh: hard-coding here...
+        if speculation_token == 1:
+            speculation_on_list.append(latency_result)
+        else:
+            speculation_off_list.append(latency_result)
 
     # sort to_return in ascending order of number of switches used
     speculation_off_list.sort(
@@ -57,7 +94,22 @@ def read_speculation_rtt_file(input_filename):
     return (speculation_off_list, speculation_on_list)
 
 
+@instrumentation.in_phase(instrumentation.PARSE_PHASE)
 def read_fairness_file(input_filename,ralph_algo):
+    '''
+    @param {String} input_filename --- @see read_fairness_arrays
+
+    @param {boolean} ralph_algo --- True if using ralph scheduling,
+    False if using wound-wait.
+
+    @returns {numpy.ndarray} --- uint8 array.  Each element is either
+    0 or 1 corresponding to which principal executed.
+    '''
+    return read_fairness_arrays(input_filename,ralph_algo)[0]
+
+
+@instrumentation.in_phase(instrumentation.PARSE_PHASE)
+def read_fairness_arrays(input_filename,ralph_algo):
     '''
     @param {String} input_filename --- Name of file to import data
     from.  Expected format of data file is:
@@ -72,39 +124,139 @@ def read_fairness_file(input_filename,ralph_algo):
     @param {boolean} ralph_algo --- True if using ralph scheduling,
     False if using wound-wait.
 
-    @returns {list} --- Each element of list is either 0 or 1
-    corresponding to which principal executed.
+    @returns {2-tuple} (a,b) --- a is a uint8 array, each element of
+    which is either 0 or 1 corresponding to which principal executed.
+    b is an int64 array of the ns timestamps at which they executed.
+
+    The file is read a block of bytes at a time, so that no line is
+    ever completely in memory.  Lines of the other algorithm are only
+    scanned for their end; only the selected line's ops get decoded,
+    each block by a single numpy.fromstring call.
     '''
-    to_return = []
-    with open(input_filename) as fd:
-        for line in fd:
-            line = line.strip()
-            # ignores any empty lines
-            if line == '':
-                continue
-            
-            token_list = line.split(',')
-            which_algo = int(token_list[0])
-            if which_algo == ralph_algo:
-                # using -1 because token_list has a trailing , at end.
-                op_list = token_list[1:-1]
-                
-                # op_list is a list of strings with the following
-                # structure: '<princ num: 0 or 1>|<timestamp>' Just
-                # getting out the principal number (as a number)
-                to_return = map(
-                    lambda op: int(op.split('|')[0]),
-                    op_list)
-                return to_return
+    with compressed.open_input(input_filename) as fd:
+        block_iter = _iter_blocks(fd)
+        # start of the current line, while looking for its first comma
+        line_start = ''
+        # true while skipping the rest of a line of the other algorithm
+        skipping = False
+        for block in block_iter:
+            position = 0
+            while position < len(block):
+                if skipping:
+                    newline_index = block.find('\n',position)
+                    if newline_index == -1:
+                        break
+                    position = newline_index + 1
+                    skipping = False
+                    continue
+
+                # the first number of a line is short: never look
+                # further than _MAX_ALGO_BYTES for the comma ending it.
+                search_end = position + _MAX_ALGO_BYTES - len(line_start)
+                comma_index = block.find(',',position,search_end)
+                newline_index = block.find('\n',position,search_end)
+                if (newline_index != -1) and (
+                    (comma_index == -1) or (newline_index < comma_index)):
+                    # ignores lines without ops, eg., empty lines
+                    line_start = ''
+                    position = newline_index + 1
+                    continue
+                if comma_index == -1:
+                    if search_end <= len(block):
+                        print '\nIncorrectly formatted fairness file\n'
+                        assert False
+                    # first number continues in the next block
+                    line_start += block[position:]
+                    position = len(block)
+                    continue
+
+                which_algo = int(line_start + block[position:comma_index])
+                line_start = ''
+                if which_algo == ralph_algo:
+                    return _decode_fairness_ops(
+                        itertools.chain(
+                            [block[comma_index + 1:]],block_iter))
+                skipping = True
+                position = comma_index + 1
 
     print '\nIncorrectly formatted fairness file\n'
     assert False
-            
 
+
+def _iter_blocks(fd):
+    '''
+    @returns {generator} --- Yields the contents of file object fd,
+    BLOCK_SIZE_BYTES at a time.
+    '''
+    while True:
+        block = fd.read(BLOCK_SIZE_BYTES)
+        if block == '':
+            return
+        instrumentation.count(instrumentation.BYTES_READ,len(block))
+        yield block
+
+
+def _decode_fairness_ops(block_iter):
+    '''
+    @param {iterator} block_iter --- Yields consecutive strings that,
+    together, start with the
+    <principal>|<timestamp>,<principal>|<timestamp>,... part of a
+    line of a fairness file.  Only read up to the end of that line.
+
+    @returns {2-tuple} --- @see read_fairness_arrays
+    '''
+    principal_array_list = []
+    timestamp_array_list = []
+    for op_string in _iter_whole_ops(block_iter):
+        # principals and timestamps alternate once | is a separator too
+        value_array = _parse_numbers(
+            op_string.replace('|',','),numpy.int64)
+        if len(value_array) % 2 != 0:
+            raise ValueError('Malformed fairness op')
+        instrumentation.count(
+            instrumentation.TIMESTAMPS_PARSED,len(value_array) // 2)
+        principal_array_list.append(value_array[0::2].astype(numpy.uint8))
+        timestamp_array_list.append(value_array[1::2])
+
+    if len(principal_array_list) == 0:
+        return (
+            numpy.zeros(0,dtype=numpy.uint8),
+            numpy.zeros(0,dtype=numpy.int64))
+    return (
+        numpy.concatenate(principal_array_list),
+        numpy.concatenate(timestamp_array_list))
+
+
+def _iter_whole_ops(block_iter):
+    '''
+    @param {iterator} block_iter --- @see _decode_fairness_ops
+
+    @returns {generator} --- Yields strings of comma-separated ops, in
+    order, up to the end of the line.  No op is split between two
+    strings.
+    '''
+    # the trailing part of the last block, which may be the beginning
+    # of an op split across blocks
+    carry = ''
+    for block in block_iter:
+        newline_index = block.find('\n')
+        if newline_index != -1:
+            yield carry + block[:newline_index]
+            return
+        op_string = carry + block
+        split_index = op_string.rfind(',') + 1
+        carry = op_string[split_index:]
+        yield op_string[:split_index]
+    # last line did not end with a newline
+    yield carry
+
+
+@instrumentation.in_phase(instrumentation.PARSE_PHASE)
 def read_latency_file(input_filename):
     '''
-    @param {String} input_filename --- Name of file to import data
-    from.  Expected format of data file is:
+    @param {String or dict} input_filename --- Name of file to import
+    data from, or a src processor job producing its rows (@see
+    util.pipeline).  Expected format of data file is:
 
     #,#,#,#,#
     #,#,#,#,#
@@ -119,30 +271,102 @@ def read_latency_file(input_filename):
     ascending order.
     '''
     to_return = []
+    for row_key, latency_data_ns in _read_rows(input_filename):
+        num_switches = int(row_key)
+        to_return.append(LatencyResult(num_switches,latency_data_ns))
 
-    with open(input_filename) as fd:
-        for line in fd:
-            # ignores any empty lines
-            if line == '':
-                continue
+    # sort to_return in ascending order of number of switches used
+    to_return.sort(
+        key = lambda latency_result: latency_result.num_switches)
+            
+    return to_return
+
+@instrumentation.in_phase(instrumentation.PARSE_PHASE)
+def read_latency_sketch_file(
+    input_filename,relative_error=DEFAULT_RELATIVE_ERROR):
+    '''
+    Same as read_latency_file, except that each row's latencies are
+    summarized in a LatencySketch as the file is streamed, instead of
+    being kept.  Memory use does not depend on the size of the file.
 
-            single_run_data = _comma_separated_string_to_float_list(
-                line)
-            num_switches = int(single_run_data[0])
-            latency_data_ns = single_run_data[1:]
+    @param {float} relative_error --- @see LatencySketch
 
-            to_return.append(LatencyResult(num_switches,latency_data_ns))
+    @returns {list} --- Each element of list is a LatencySketchResult
+    object.  List is sorted by number of switches running, in
+    ascending order.
+    '''
+    to_return = []
+    for row_index, row_key, latency_chunk_ns in _iter_row_chunks(
+        input_filename):
+        if row_index == len(to_return):
+            to_return.append(
+                LatencySketchResult(
+                    int(row_key),LatencySketch(relative_error)))
+        to_return[row_index].latency_sketch.add(latency_chunk_ns)
 
     # sort to_return in ascending order of number of switches used
     to_return.sort(
         key = lambda latency_result: latency_result.num_switches)
-            
+
+    return to_return
+
+@instrumentation.in_phase(instrumentation.PARSE_PHASE)
+def read_latency_summary_file(input_filename,sketch_relative_error=None):
+    '''
+    For reports that only need percentiles, averages and standard
+    deviations of latencies.
+
+    @param {float or None} sketch_relative_error --- None to read
+    every latency with read_latency_file.  Otherwise, the relative
+    error of sketches read with read_latency_sketch_file.
+
+    @returns {list} --- Each element of list is a LatencyResult or
+    LatencySketchResult object.  List is sorted by number of switches
+    running, in ascending order.
+    '''
+    if sketch_relative_error is None:
+        return read_latency_file(input_filename)
+    return read_latency_sketch_file(input_filename,sketch_relative_error)
+
+@instrumentation.in_phase(instrumentation.PARSE_PHASE)
+def read_box_stats_file(input_filename):
+    '''
+    @param {String or dict} input_filename --- Name of a stats file
+    written by a src latency processor's output_stats_filename, or a
+    src processor job producing latency rows (@see util.pipeline),
+    whose statistics get computed row by row.  Expected format of data
+    file is:
+
+    #,#,#,#,#
+    #,#,#,#,#
+
+    where the first number of a line is the number of switches in the
+    experiment and the subsequent numbers are the statistics named by
+    util.box_stats.STAT_NAME_LIST, in ns.
+
+    @returns {list} --- Each element is a (a,b) tuple.  a is the
+    number of switches, b is an array of statistics.  List is sorted
+    by number of switches running, in ascending order.
+    '''
+    if pipeline.is_src_job(input_filename):
+        to_return = [
+            (int(row_key),box_stats.box_stats(latencies_ns))
+            for row_key, latencies_ns in pipeline.iter_rows(input_filename)]
+    else:
+        to_return = [
+            (int(row_key),numpy.asarray(stat_list,dtype=numpy.float64))
+            for row_key, stat_list in _read_rows(input_filename)]
+
+    # sort to_return in ascending order of number of switches used
+    to_return.sort(key = lambda key_stats: key_stats[0])
     return to_return
 
+@instrumentation.in_phase(instrumentation.PARSE_PHASE)
 def read_rtt_latency_file(input_filename):
     '''
-    @param {String} input_filename --- Name of file to import data
-    from.  Expected format of data file is:
+    @param {String or dict} input_filename --- Name of file to import
+    data from, or a src processor job producing its rows (@see
+    util.pipeline).  Expected format of data file is:
 
     #,#,#,#,#
     #,#,#,#,#
@@ -156,20 +380,10 @@ def read_rtt_latency_file(input_filename):
     object.  List is sorted by artificial latency, in ascending order.
     '''
     to_return = []
-
-    with open(input_filename) as fd:
-        for line in fd:
-            # ignores any empty lines
-            if line == '':
-                continue
-
-            single_run_data = _comma_separated_string_to_float_list(
-                line)
-            artificial_latency_ns = int(single_run_data[0])
-            latency_data_ns = single_run_data[1:]
-
-            to_return.append(
-                LatencyResult(1,latency_data_ns,artificial_latency_ns))
+    for row_key, latency_data_ns in _read_rows(input_filename):
+        artificial_latency_ns = int(row_key)
+        to_return.append(
+            LatencyResult(1,latency_data_ns,artificial_latency_ns))
 
     # sort to_return in ascending order of rtt latency
     to_return.sort(
@@ -179,10 +393,12 @@ def read_rtt_latency_file(input_filename):
 
 
 
+@instrumentation.in_phase(instrumentation.PARSE_PHASE)
 def read_throughput_file(input_filename):
     '''
-    @param {String} input_filename --- Name of file to import data
-    from.  Expected format of data file is:
+    @param {String or dict} input_filename --- Name of file to import
+    data from, or a src processor job producing its rows (@see
+    util.pipeline).  Expected format of data file is:
     
     #,#,#,#,#
     #,#,#,#,#
@@ -197,20 +413,9 @@ def read_throughput_file(input_filename):
     ascending order.
     '''
     to_return = []
-
-    with open(input_filename) as fd:
-
-        for line in fd:
-            # ignores any empty lines
-            if line == '':
-                continue
-
-            single_run_data = _comma_separated_string_to_float_list(
-                line)
-            num_switches = int(single_run_data[0])
-            throughput_data = single_run_data[1:]
-
-            to_return.append(ThroughputResult(num_switches,throughput_data))
+    for row_key, throughput_data in _read_rows(input_filename):
+        num_switches = int(row_key)
+        to_return.append(ThroughputResult(num_switches,throughput_data))
 
     # sort to_return in ascending order of number of switches used
     to_return.sort(
@@ -218,15 +423,123 @@ def read_throughput_file(input_filename):
             
     return to_return
             
-def _comma_separated_string_to_float_list(line):
+def _read_rows(input_filename):
+    '''
+    @param {String or dict} input_filename --- Either the name of a
+    file, each line of which contains comma-separated numbers, the
+    name of an equivalent binary row file (@see util.row_file), or a
+    src processor job that produces such lines (@see util.pipeline).
+
+    @returns {list} --- Each element is a (a,b) tuple, one per line.
+    a is the first number of the line, b is a list or array of the
+    line's subsequent numbers.
     '''
-    @param {String} line --- comma-separated string of numbers.
+    if pipeline.is_src_job(input_filename):
+        return pipeline.produce_rows(input_filename)
+    if row_file.is_row_file(input_filename):
+        # binary intermediate file: values are memory-mapped, not parsed
+        return row_file.read_row_file(input_filename)
 
-    @returns{list} --- Each element is a float.
+    to_return = []
+    with compressed.open_input(input_filename) as fd:
+        for line in fd:
+            instrumentation.count(instrumentation.BYTES_READ,len(line))
+            # ignores any empty lines
+            if line.strip() == '':
+                continue
+
+            single_run_data = _parse_numbers(line)
+            instrumentation.count(
+                instrumentation.VALUES_PARSED,len(single_run_data))
+            to_return.append((single_run_data[0],single_run_data[1:]))
+    return to_return
+
+def _iter_row_chunks(input_filename):
     '''
-    string_list = line.split(',')
-    float_list = map(
-        lambda string : float(string),
-        string_list)
-    return float_list
+    @param {String or dict} input_filename --- @see _read_rows
 
+    @returns {generator} --- Yields (a,b,c) tuples.  a is the index of
+    a row, b is the row's first number, and c is an array holding some
+    of the row's subsequent numbers, in order.  Rows are yielded in
+    order, each at least once, so that no row, or line of a text file,
+    is ever completely in memory.
+    '''
+    if pipeline.is_src_job(input_filename):
+        # each row is produced whole, but only one at a time
+        for row_index, (row_key, row_values) in enumerate(
+            pipeline.iter_rows(input_filename)):
+            yield row_index, row_key, row_values
+        return
+
+    if row_file.is_row_file(input_filename):
+        for row_index, (row_key, row_values) in enumerate(
+            row_file.read_row_file(input_filename)):
+            # values are memory-mapped: only touch a chunk at a time
+            for start in range(0,max(len(row_values),1),CHUNK_LENGTH):
+                yield row_index, row_key, row_values[start:start+CHUNK_LENGTH]
+        return
+
+    row_index = 0
+    row_key = None
+    carry = ''
+    with compressed.open_input(input_filename) as fd:
+        while True:
+            block = fd.read(BLOCK_SIZE_BYTES)
+            instrumentation.count(instrumentation.BYTES_READ,len(block))
+            data = carry + block
+            if block == '':
+                # end of file ends the last line
+                data += '\n'
+                carry = ''
+            else:
+                # last number may continue in the next block
+                split_index = max(data.rfind(','),data.rfind('\n')) + 1
+                carry = data[split_index:]
+                data = data[:split_index]
+
+            line_piece_list = data.split('\n')
+            for piece_index, line_piece in enumerate(line_piece_list):
+                if line_piece.strip().strip(',') != '':
+                    values = _parse_numbers(line_piece)
+                    instrumentation.count(
+                        instrumentation.VALUES_PARSED,len(values))
+                    if row_key is None:
+                        row_key = values[0]
+                        values = values[1:]
+                    yield row_index, row_key, values
+
+                line_ended = piece_index != len(line_piece_list) - 1
+                if line_ended and (row_key is not None):
+                    row_index += 1
+                    row_key = None
+
+            if block == '':
+                return
+
+
+def _parse_numbers(text,dtype=numpy.float64):
+    '''
+    @param {String} text --- Comma-separated numbers.  Whitespace and
+    commas before the first number or after the last one are ignored,
+    so that, eg., an empty row's line '3,' holds only the number 3.
+
+    @returns {numpy.ndarray} --- The numbers, as dtype.  Raises
+    ValueError if any entry is empty, only whitespace, or not a
+    number.
+    '''
+    stripped = text.strip(string.whitespace + ',')
+    if stripped == '':
+        return numpy.empty(0,dtype=dtype)
+    to_return = numpy.fromstring(stripped,dtype=dtype,sep=',')
+    # numpy stops, silently, at the first empty or malformed entry,
+    # and ignores anything after the last number it parses.
+    if len(to_return) != stripped.count(',') + 1:
+        raise ValueError('Malformed comma-separated numbers')
+    # numpy reads a whitespace-only entry as -1 (floats) or 0 (ints);
+    # only rows holding such numbers need to be searched for one.
+    if ((to_return.min() <= 0) and
+            (_BLANK_ENTRY_REGEX.search(stripped) is not None)):
+        raise ValueError('Blank entry in comma-separated numbers')
+    # raises ValueError if the last entry is malformed
+    numpy.dtype(dtype).type(stripped[stripped.rfind(',') + 1:])
+    return to_return
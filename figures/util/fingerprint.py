@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+
+from atomic_output import atomic_open
+
+'''
+Lets generate.py skip processor jobs whose results are already up to
+date, like make.
+
+A job's fingerprint covers its processor name, its args, the size and
+mtime of every input file its args name, and the size and mtime of
+every source file of the scripts themselves.  After a job succeeds,
+the size and mtime of each of its output files is recorded under its
+fingerprint.  A later run skips the job if its fingerprint is
+unchanged and each output file is still exactly as recorded.
+
+Args whose key ends in 'filename' name files, or lists of files.
+Those whose key starts with 'output' are outputs; all others are
+inputs.  Keys are found at any depth, so eg., the 'filename' of each
+input_tuple_list entry is an input.
+'''
+
+FINGERPRINT_SUFFIX = '.fingerprints'
+
+
+def fingerprint_store_filename(cfg_filename):
+    '''
+    @returns {String} --- Name of the file recording fingerprints for
+    the jobs in config file cfg_filename.
+    '''
+    return cfg_filename + FINGERPRINT_SUFFIX
+
+
+def code_stamp(directory):
+    '''
+    @param {String} directory --- Root directory of the scripts.
+
+    @returns {list} --- Describes the size and mtime of every .py file
+    under directory.  Changes whenever any of the scripts do.
+    '''
+    to_return = []
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith('.py'):
+                full_filename = os.path.join(dirpath,filename)
+                to_return.append(
+                    [os.path.relpath(full_filename,directory),
+                     _file_stamp(full_filename)])
+    return to_return
+
+
+def job_filenames(args):
+    '''
+    @param {dict} args --- The args of a processor job.
+
+    @returns {2-tuple} (a,b) --- a is a list of the names of input
+    files the job reads; b is a list of names of output files it
+    writes.
+    '''
+    input_filename_list = []
+    output_filename_list = []
+
+    def walk(value):
+        if isinstance(value,dict):
+            for key in sorted(value.keys()):
+                element = value[key]
+                filename_list = None
+                if key.endswith('filename'):
+                    filename_list = _as_filename_list(element)
+                if filename_list is None:
+                    walk(element)
+                elif key.startswith('output'):
+                    output_filename_list.extend(filename_list)
+                else:
+                    input_filename_list.extend(filename_list)
+        elif isinstance(value,list):
+            for element in value:
+                walk(element)
+
+    walk(args)
+    return input_filename_list, output_filename_list
+
+
+def job_stage_list(config_list):
+    '''
+    @param {list} config_list --- Every job of a config file.
+
+    @returns {list} --- Each element is a list of indices into
+    config_list, in config order, of jobs that can run at the same
+    time.  A job is only in a later element than every earlier job
+    that writes a file it reads (eg., a figure of rows another job
+    writes), that reads a file it writes, or that writes a file it
+    also writes.
+    '''
+    # file name -> index of the last job so far that writes it
+    writer_index_dict = {}
+    # file name -> indices of jobs so far that read it
+    reader_index_list_dict = {}
+    stage_index_list = []
+    for index, processor_job in enumerate(config_list):
+        input_filename_list, output_filename_list = [
+            [os.path.abspath(filename) for filename in filename_list]
+            for filename_list in job_filenames(processor_job['args'])]
+
+        earlier_index_list = []
+        for filename in input_filename_list + output_filename_list:
+            if filename in writer_index_dict:
+                earlier_index_list.append(writer_index_dict[filename])
+        for filename in output_filename_list:
+            earlier_index_list.extend(
+                reader_index_list_dict.get(filename,[]))
+        stage_index_list.append(
+            max([stage_index_list[earlier_index] + 1
+                 for earlier_index in earlier_index_list] + [0]))
+
+        for filename in input_filename_list:
+            reader_index_list_dict.setdefault(filename,[]).append(index)
+        for filename in output_filename_list:
+            writer_index_dict[filename] = index
+
+    num_stages = max(stage_index_list + [-1]) + 1
+    to_return = [[] for stage_index in range(0,num_stages)]
+    for index, stage_index in enumerate(stage_index_list):
+        to_return[stage_index].append(index)
+    return to_return
+
+
+def job_fingerprint(processor_job,code_stamp_list):
+    '''
+    @param {dict} processor_job --- A single job from the config file.
+
+    @param {list} code_stamp_list --- @see code_stamp
+
+    @returns {String} --- Hex digest that changes whenever the job's
+    result could.
+    '''
+    input_filename_list, output_filename_list = job_filenames(
+        processor_job['args'])
+    description = {
+        'name': processor_job['name'],
+        'args': processor_job['args'],
+        'inputs': [
+            [input_filename,_file_stamp(input_filename)]
+            for input_filename in input_filename_list],
+        'code': code_stamp_list,
+        }
+    return hashlib.sha1(json.dumps(description,sort_keys=True)).hexdigest()
+
+
+class FingerprintStore(object):
+    def __init__(self,store_filename):
+        '''
+        @param {String} store_filename --- File to load recorded
+        fingerprints from and save them to.  Does not need to exist.
+        '''
+        self.store_filename = store_filename
+        try:
+            with open(store_filename,'r') as fd:
+                self.fingerprint_dict = json.loads(fd.read())
+        except (IOError,ValueError):
+            self.fingerprint_dict = {}
+
+    def is_up_to_date(self,fingerprint,output_filename_list):
+        '''
+        @returns {bool} --- True if a job with fingerprint already
+        produced output_filename_list and none of them has changed
+        since.
+        '''
+        if len(output_filename_list) == 0:
+            return False
+        recorded = self.fingerprint_dict.get(fingerprint,None)
+        if recorded is None:
+            return False
+        return recorded == self._output_stamps(output_filename_list)
+
+    def record(self,fingerprint,output_filename_list):
+        '''
+        Call after a job with fingerprint successfully produced
+        output_filename_list.
+        '''
+        self.fingerprint_dict[fingerprint] = self._output_stamps(
+            output_filename_list)
+
+    def save(self,live_fingerprint_list):
+        '''
+        @param {list} live_fingerprint_list --- Fingerprints of the jobs
+        in the current config.  Fingerprints for other jobs are
+        dropped.
+        '''
+        live_fingerprint_set = set(live_fingerprint_list)
+        self.fingerprint_dict = dict(
+            (fingerprint,recorded)
+            for fingerprint, recorded in self.fingerprint_dict.items()
+            if fingerprint in live_fingerprint_set)
+        with atomic_open(self.store_filename) as fd:
+            fd.write(json.dumps(self.fingerprint_dict,sort_keys=True))
+
+    def _output_stamps(self,output_filename_list):
+        return [
+            [output_filename,_file_stamp(output_filename)]
+            for output_filename in output_filename_list]
+
+
+def _as_filename_list(value):
+    '''
+    @returns {list or None} --- The file names that value, the value
+    of an arg whose key ends in 'filename', names: either a single
+    file name or a list of them (eg., one figure saved in several
+    formats).  None if value names no files (eg., a src processor
+    job).
+    '''
+    if isinstance(value,basestring):
+        return [value]
+    if ((isinstance(value,list) and (len(value) != 0) and
+         all(isinstance(element,basestring) for element in value))):
+        return value
+    return None
+
+
+def _file_stamp(filename):
+    '''
+    @returns {list or None} --- [size, mtime] of filename or None if
+    filename does not exist.
+    '''
+    try:
+        stat_result = os.stat(filename)
+    except OSError:
+        return None
+    return [stat_result.st_size,stat_result.st_mtime]
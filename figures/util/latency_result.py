@@ -1,34 +1,101 @@
 import numpy
 
+NS_PER_MS = 1000000.
+
 class LatencyResult(object):
+    # one array per result: no per-instance dict, no second copy in ms
+    __slots__ = [
+        'num_switches','latency_array_ns','artificial_rtt_ns',
+        '_sorted_latency_array_ns']
+
     def __init__(self,num_switches,latency_list_ns,artificial_rtt_ns=0):
         '''
         @param {int} num_switches --- The number of switches used in
         the experiment.
 
-        @param {list} latency_list_ns --- A list of ints.  Each int is
-        the number of ns an op took.
+        @param {list or numpy.ndarray} latency_list_ns --- Each
+        element is the number of ns an op took.  Arrays (eg.,
+        memory-mapped rows of a binary row file) are kept without
+        being copied.
 
         @param {int} artificial_rtt_ns --- the artificial latnecy that
         injected into the system
         '''
         self.num_switches = num_switches
-        self.latency_list_ns = latency_list_ns
+        self.latency_array_ns = numpy.asarray(latency_list_ns)
+        self.artificial_rtt_ns = artificial_rtt_ns
+        self._sorted_latency_array_ns = None
 
-        self.latency_list_ms = map(
-            lambda ns : ns / 1000000.,
-            latency_list_ns)
+    @property
+    def latency_list_ns(self):
+        return self.latency_array_ns
+
+    @property
+    def latency_list_ms(self):
+        '''
+        @returns {numpy.ndarray} --- Each op's latency, in ms.
+        Computed on each access; prefer the methods below for
+        statistics.
+        '''
+        return self.latency_array_ns / NS_PER_MS
+
+    @property
+    def artificial_rtt_ms(self):
+        return float(self.artificial_rtt_ns) / NS_PER_MS
 
-        self.artificial_rtt_ns = artificial_rtt_ns
-        self.artificial_rtt_ms = (
-            float(artificial_rtt_ns) / 1000000.)
-        
     def median_latency_ms(self):
         '''
         @returns {float} --- The median latency of all programs, in
         ms.
         '''
-        return numpy.median(self.latency_list_ms)
+        return self.percentile_latency_ms(50)
 
     def percentile_latency_ms(self,which_percentile):
-        return numpy.percentile(self.latency_list_ms,which_percentile)
+        return self.percentiles_latency_ms([which_percentile])[0]
+
+    def percentiles_latency_ms(self,percentile_list):
+        '''
+        @param {list} percentile_list --- Each element is a number
+        between 0 and 100.
+
+        @returns {list} --- Each element is the corresponding
+        percentile of all latencies, in ms, as numpy.percentile would
+        compute it.  Latencies are only sorted the first time any
+        percentile is asked for.
+        '''
+        return list(self.percentiles_latency_ns(percentile_list) / NS_PER_MS)
+
+    def percentiles_latency_ns(self,percentile_list):
+        '''
+        @returns {numpy.ndarray} --- Same as percentiles_latency_ms, in
+        ns.
+        '''
+        sorted_latency_array_ns = self.sorted_latencies_ns()
+        num_latencies = len(sorted_latency_array_ns)
+        # interpolate linearly between the two closest ranks
+        rank_array = (
+            numpy.asarray(percentile_list,dtype=numpy.float64) *
+            (num_latencies - 1) / 100.)
+        lower_rank_array = numpy.floor(rank_array).astype(numpy.int64)
+        upper_rank_array = numpy.minimum(
+            lower_rank_array + 1,num_latencies - 1)
+        lower_array = sorted_latency_array_ns[lower_rank_array]
+        upper_array = sorted_latency_array_ns[upper_rank_array]
+        return lower_array + (
+            (upper_array - lower_array) * (rank_array - lower_rank_array))
+
+    def average_latency_ms(self):
+        return self.latency_array_ns.mean() / NS_PER_MS
+
+    def stddev_latency_ms(self):
+        return self.latency_array_ns.std() / NS_PER_MS
+
+    def sorted_latencies_ns(self):
+        '''
+        @returns {numpy.ndarray} --- Every latency, in ascending order.
+        Sorted on the first call only.
+        '''
+        if self._sorted_latency_array_ns is None:
+            self._sorted_latency_array_ns = numpy.sort(
+                self.latency_array_ns)
+        return self._sorted_latency_array_ns
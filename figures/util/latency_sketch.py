@@ -0,0 +1,228 @@
+import math
+
+import numpy
+
+'''
+Constant-memory summary of a set of latencies, for traces too large to
+hold every op's latency in memory.
+
+Latencies are counted in logarithmically sized buckets: bucket i holds
+latencies in (gamma^(i-1), gamma^i], where gamma = (1 + a) / (1 - a)
+for relative error a.  Reporting every latency in a bucket as
+2 * gamma^i / (gamma + 1) is off by at most a fraction a of its true
+value, so every percentile is accurate to within a relative error of
+a.  Memory depends only on a and the ratio of the largest latency to
+the smallest (about 1400 buckets for a = .01 and latencies between
+1 ns and 1000 s), not on the number of latencies.
+
+Sketches with the same relative error can be merged, eg., to combine
+the latencies of several switches or files.
+'''
+
+DEFAULT_RELATIVE_ERROR = .01
+
+NS_PER_MS = 1000000.
+
+
+class LatencySketch(object):
+    def __init__(self,relative_error=DEFAULT_RELATIVE_ERROR):
+        '''
+        @param {float} relative_error --- Between 0 and 1.  Maximum
+        relative error of any percentile of the sketch.
+        '''
+        if (relative_error <= 0) or (relative_error >= 1):
+            print '\nSketch relative error must be between 0 and 1.\n'
+            assert False
+
+        self.relative_error = relative_error
+        self.gamma = (1. + relative_error) / (1. - relative_error)
+        self._log_gamma = math.log(self.gamma)
+
+        self.count = 0
+        # latencies of 0 ns do not fit a logarithmic bucket
+        self.zero_count = 0
+        self.min_index = 0
+        self.bucket_counts = numpy.zeros(0,dtype=numpy.int64)
+        self.min_ns = None
+        self.max_ns = None
+        self._sum_ns = 0.
+        self._sum_squares_ns = 0.
+
+    def add(self,latencies_ns):
+        '''
+        @param {list or numpy.ndarray} latencies_ns --- Non-negative op
+        latencies, in ns, to count.  Can be called any number of times,
+        eg., once per block of a streamed file.
+        '''
+        latencies_ns = numpy.asarray(latencies_ns,dtype=numpy.float64)
+        if len(latencies_ns) == 0:
+            return
+
+        self.count += len(latencies_ns)
+        self._sum_ns += latencies_ns.sum()
+        self._sum_squares_ns += numpy.dot(latencies_ns,latencies_ns)
+        self._update_extremes(latencies_ns.min(),latencies_ns.max())
+
+        positive_latencies_ns = latencies_ns[latencies_ns > 0]
+        self.zero_count += len(latencies_ns) - len(positive_latencies_ns)
+        if len(positive_latencies_ns) == 0:
+            return
+
+        index_array = numpy.ceil(
+            numpy.log(positive_latencies_ns) /
+            self._log_gamma).astype(numpy.int64)
+        self._cover(index_array.min(),index_array.max())
+        self.bucket_counts += numpy.bincount(
+            index_array - self.min_index,
+            minlength=len(self.bucket_counts))
+
+    def merge(self,other_sketch):
+        '''
+        Adds every latency counted by other_sketch to this sketch.
+
+        @param {LatencySketch} other_sketch --- Must have the same
+        relative error as this sketch.
+        '''
+        if other_sketch.relative_error != self.relative_error:
+            print '\nCannot merge sketches with different relative errors.\n'
+            assert False
+        if other_sketch.count == 0:
+            return
+
+        self.count += other_sketch.count
+        self.zero_count += other_sketch.zero_count
+        self._sum_ns += other_sketch._sum_ns
+        self._sum_squares_ns += other_sketch._sum_squares_ns
+        self._update_extremes(other_sketch.min_ns,other_sketch.max_ns)
+
+        num_other_buckets = len(other_sketch.bucket_counts)
+        if num_other_buckets == 0:
+            return
+        self._cover(
+            other_sketch.min_index,
+            other_sketch.min_index + num_other_buckets - 1)
+        start = other_sketch.min_index - self.min_index
+        self.bucket_counts[start:start + num_other_buckets] += (
+            other_sketch.bucket_counts)
+
+    def percentile_ns(self,which_percentile):
+        '''
+        @param {float} which_percentile --- Between 0 and 100.
+
+        @returns {float} --- Same as numpy.percentile of every latency
+        added, within the sketch's relative error.
+        '''
+        if self.count == 0:
+            print '\nCannot take a percentile of an empty sketch.\n'
+            assert False
+
+        # numpy.percentile interpolates between the two closest ranks
+        rank = (self.count - 1) * which_percentile / 100.
+        lower_rank = int(math.floor(rank))
+        upper_rank = min(lower_rank + 1,self.count - 1)
+        lower_ns, upper_ns = self._rank_values_ns([lower_rank,upper_rank])
+        return lower_ns + (upper_ns - lower_ns) * (rank - lower_rank)
+
+    def average_ns(self):
+        '''
+        @returns {float} --- Exact average of every latency added.
+        '''
+        return self._sum_ns / self.count
+
+    def stddev_ns(self):
+        '''
+        @returns {float} --- Population standard deviation of every
+        latency added.
+        '''
+        average_ns = self.average_ns()
+        variance = self._sum_squares_ns / self.count - average_ns ** 2
+        return math.sqrt(max(variance,0.))
+
+    def _rank_values_ns(self,rank_list):
+        '''
+        @returns {list} --- Estimated latency of the op at each rank
+        (index into the sorted latencies) of rank_list.
+        '''
+        cumulative_counts = (
+            numpy.cumsum(self.bucket_counts) + self.zero_count)
+        to_return = []
+        for rank in rank_list:
+            if rank < self.zero_count:
+                to_return.append(0.)
+                continue
+            bucket = int(numpy.searchsorted(
+                cumulative_counts,rank,side='right'))
+            value_ns = (
+                2. * self.gamma ** (self.min_index + bucket) /
+                (self.gamma + 1.))
+            # exact extremes are known: never report past them
+            to_return.append(min(max(value_ns,self.min_ns),self.max_ns))
+        return to_return
+
+    def _cover(self,low_index,high_index):
+        '''
+        Grows bucket_counts so that it has buckets low_index through
+        high_index.
+        '''
+        if len(self.bucket_counts) == 0:
+            self.min_index = low_index
+            self.bucket_counts = numpy.zeros(
+                high_index - low_index + 1,dtype=numpy.int64)
+            return
+
+        max_index = self.min_index + len(self.bucket_counts) - 1
+        num_below = max(self.min_index - low_index,0)
+        num_above = max(high_index - max_index,0)
+        if (num_below == 0) and (num_above == 0):
+            return
+        self.bucket_counts = numpy.concatenate(
+            (numpy.zeros(num_below,dtype=numpy.int64),
+             self.bucket_counts,
+             numpy.zeros(num_above,dtype=numpy.int64)))
+        self.min_index -= num_below
+
+    def _update_extremes(self,min_ns,max_ns):
+        if (self.min_ns is None) or (min_ns < self.min_ns):
+            self.min_ns = float(min_ns)
+        if (self.max_ns is None) or (max_ns > self.max_ns):
+            self.max_ns = float(max_ns)
+
+
+class LatencySketchResult(object):
+    def __init__(self,num_switches,latency_sketch,artificial_rtt_ns=0):
+        '''
+        Same interface as LatencyResult for reports that only need
+        percentiles, averages and standard deviations of latencies.
+
+        @param {int} num_switches --- The number of switches used in
+        the experiment.
+
+        @param {LatencySketch} latency_sketch --- Summarizes the ns
+        each op took.
+
+        @param {int} artificial_rtt_ns --- the artificial latency that
+        was injected into the system
+        '''
+        self.num_switches = num_switches
+        self.latency_sketch = latency_sketch
+
+        self.artificial_rtt_ns = artificial_rtt_ns
+        self.artificial_rtt_ms = (
+            float(artificial_rtt_ns) / NS_PER_MS)
+
+    def median_latency_ms(self):
+        return self.percentile_latency_ms(50)
+
+    def percentile_latency_ms(self,which_percentile):
+        return self.latency_sketch.percentile_ns(which_percentile) / NS_PER_MS
+
+    def percentiles_latency_ms(self,percentile_list):
+        return [
+            self.percentile_latency_ms(which_percentile)
+            for which_percentile in percentile_list]
+
+    def average_latency_ms(self):
+        return self.latency_sketch.average_ns() / NS_PER_MS
+
+    def stddev_latency_ms(self):
+        return self.latency_sketch.stddev_ns() / NS_PER_MS
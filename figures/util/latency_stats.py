@@ -0,0 +1,165 @@
+import numpy
+
+from latency_result import NS_PER_MS
+import box_stats
+
+'''
+Statistics of a whole list of LatencyResult objects (eg., every row of
+a sweep over rtts) at once.  Every result's latencies get concatenated
+into one array, with an offset marking where each result starts, and
+count, mean, std, min and max of every result come from a single
+vectorized pass over that array, without sorting anything.
+
+Percentiles and box statistics need each result's latencies in order.
+They are only computed when asked for, from each result's own sorted
+latencies (@see LatencyResult.sorted_latencies_ns), which every later
+percentile of that result reuses.
+'''
+
+DEFAULT_PERCENTILE_LIST = [5,25,50,75,95]
+
+_MOMENT_STAT_NAME_LIST = ['count','mean','std','min','max']
+
+
+class LatencyStatsTable(object):
+    def __init__(self,latency_result_list,
+                 percentile_list=DEFAULT_PERCENTILE_LIST):
+        '''
+        @param {list} latency_result_list --- Each element is a
+        LatencyResult object with at least one latency.
+
+        @param {list} percentile_list --- Each element is a number
+        between 0 and 100.  Percentiles to compute for each result, as
+        numpy.percentile would.
+
+        Statistics, in order, are: count, mean, std, min, max, then one
+        per element of percentile_list, named 'p<percentile>' (eg.,
+        'p50').  All but count are in ms.
+        '''
+        self.latency_result_list = list(latency_result_list)
+        self.percentile_list = list(percentile_list)
+        self.stat_name_list = (
+            _MOMENT_STAT_NAME_LIST +
+            ['p%s' % (which_percentile,)
+             for which_percentile in self.percentile_list])
+
+        length_array = numpy.array(
+            [len(latency_result.latency_array_ns)
+             for latency_result in self.latency_result_list],
+            dtype=numpy.int64)
+        if numpy.any(length_array == 0):
+            print '\nCannot compute statistics of an empty result.\n'
+            assert False
+        # result i's latencies are latency_array_ns[
+        # offset_array[i]:offset_array[i+1]]
+        self.offset_array = numpy.concatenate(
+            ([0],numpy.cumsum(length_array)))
+        start_array = self.offset_array[:-1]
+
+        latency_array_ns = numpy.concatenate(
+            [latency_result.latency_array_ns
+             for latency_result in self.latency_result_list]).astype(
+            numpy.float64)
+        min_array = numpy.minimum.reduceat(latency_array_ns,start_array)
+        max_array = numpy.maximum.reduceat(latency_array_ns,start_array)
+        mean_array = numpy.add.reduceat(
+            latency_array_ns,start_array) / length_array
+        # squared deviations overwrite the latencies: no more copies
+        for row_index in range(0,len(length_array)):
+            latency_array_ns[self.offset_array[row_index]:
+                             self.offset_array[row_index + 1]] -= (
+                mean_array[row_index])
+        numpy.square(latency_array_ns,out=latency_array_ns)
+        std_array = numpy.sqrt(
+            numpy.add.reduceat(latency_array_ns,start_array) /
+            length_array)
+        del latency_array_ns
+
+        # stat name -> that statistic of every result, in ms
+        self._column_dict = {
+            'count': length_array.astype(numpy.float64),
+            'mean': mean_array / NS_PER_MS,
+            'std': std_array / NS_PER_MS,
+            'min': min_array / NS_PER_MS,
+            'max': max_array / NS_PER_MS,
+            }
+
+    @property
+    def stat_matrix_ms(self):
+        '''
+        @returns {numpy.ndarray} --- Matrix with a row per element of
+        latency_result_list and a column per element of
+        stat_name_list.  Computes every percentile.
+        '''
+        return numpy.column_stack(
+            [self.column(stat_name) for stat_name in self.stat_name_list])
+
+    def column(self,stat_name):
+        '''
+        @param {String} stat_name --- An element of stat_name_list.
+
+        @returns {numpy.ndarray} --- The statistic for every result, in
+        order.  Percentiles are computed the first time any is asked
+        for.
+        '''
+        if stat_name not in self.stat_name_list:
+            print '\nUnknown statistic %s.\n' % stat_name
+            assert False
+        if stat_name not in self._column_dict:
+            percentile_matrix_ms = (
+                self._percentiles_ns(self.percentile_list) / NS_PER_MS)
+            for stat_index, percentile_stat_name in enumerate(
+                    self.stat_name_list[len(_MOMENT_STAT_NAME_LIST):]):
+                self._column_dict[percentile_stat_name] = (
+                    percentile_matrix_ms[:,stat_index])
+        return self._column_dict[stat_name]
+
+    def bxp_dict_list(self):
+        '''
+        @returns {list} --- One dict per result, describing its box in
+        the form that matplotlib's Axes.bxp takes (@see
+        util.box_stats).  Values are in ms.
+        '''
+        q1_array, median_array, q3_array = (
+            self._percentiles_ns([25,50,75]).T)
+        iqr_array = q3_array - q1_array
+        low_bound_array = q1_array - box_stats.WHISKER_IQR_FACTOR * iqr_array
+        high_bound_array = q3_array + box_stats.WHISKER_IQR_FACTOR * iqr_array
+
+        # most extreme latencies of each result within the bounds
+        whisker_low_array = numpy.empty(len(self.latency_result_list))
+        whisker_high_array = numpy.empty(len(self.latency_result_list))
+        for row_index, latency_result in enumerate(self.latency_result_list):
+            sorted_latency_array_ns = latency_result.sorted_latencies_ns()
+            whisker_low_array[row_index] = sorted_latency_array_ns[
+                numpy.searchsorted(
+                    sorted_latency_array_ns,low_bound_array[row_index],
+                    side='left')]
+            whisker_high_array[row_index] = sorted_latency_array_ns[
+                numpy.searchsorted(
+                    sorted_latency_array_ns,high_bound_array[row_index],
+                    side='right') - 1]
+        whisker_low_array = numpy.minimum(whisker_low_array,q1_array)
+        whisker_high_array = numpy.maximum(whisker_high_array,q3_array)
+
+        stat_matrix_ns = numpy.column_stack(
+            (whisker_low_array,q1_array,median_array,q3_array,
+             whisker_high_array,
+             self.column('mean') * NS_PER_MS,
+             self.column('min') * NS_PER_MS,
+             self.column('max') * NS_PER_MS,
+             self.column('count')))
+        return [
+            box_stats.to_bxp_dict(stat_array_ns,1 / NS_PER_MS)
+            for stat_array_ns in stat_matrix_ns]
+
+    def _percentiles_ns(self,percentile_list):
+        '''
+        @returns {numpy.ndarray} --- Matrix with a row per result and a
+        column per element of percentile_list, in ns.
+        '''
+        return numpy.array(
+            [latency_result.percentiles_latency_ns(percentile_list)
+             for latency_result in self.latency_result_list],
+            dtype=numpy.float64).reshape(
+            len(self.latency_result_list),len(percentile_list))
@@ -0,0 +1,136 @@
+import importlib
+import os
+import sys
+
+import instrumentation
+
+'''
+Runs src processors from inside a figures job, so that figures can be
+produced straight from raw traces.
+
+Instead of naming an intermediate file, a figures job's input can
+name the src processor job that would have produced that file:
+
+    "input_filename": {
+        "name": "single.latency_contention",
+        "args": { "input_tuple_list": [ ... ] }
+    }
+
+The src processor's rows go straight into LatencyResult and
+ThroughputResult objects without being formatted to and parsed back
+from text.  The intermediate file is only written if the src job's
+args include an output_filename.
+'''
+
+SRC_DIRECTORY = os.path.abspath(
+    os.path.join(os.path.dirname(__file__),'..','..','src'))
+
+# Both src and figures have top-level util and modules packages.
+# src's copies get imported with figures' copies temporarily taken out
+# of sys.modules, and figures' copies are put back afterwards.
+_SHARED_PACKAGE_NAMES = ['util','modules']
+
+_src_get_processor = None
+_src_other = None
+# Python 2 clears a module's globals when the module is garbage
+# collected; hold on to src's modules once they leave sys.modules.
+_src_module_dict = None
+
+
+def is_src_job(input_value):
+    '''
+    @returns {bool} --- True if input_value, the value of an input
+    arg of a figures job, names a src processor job instead of a file.
+    '''
+    return isinstance(input_value,dict)
+
+
+def produce_rows(src_processor_job):
+    '''
+    @param {dict} src_processor_job --- Has the same form as a job in
+    a src config file: 'name' points to a src processor name, 'args'
+    points to its args.
+
+    @returns {list} --- Each element is a (a,b) tuple.  a is the first
+    number of a line in the src processor's output, b is an array of
+    the line's subsequent numbers.
+    '''
+    args = src_processor_job['args']
+    processor = _get_src_processor(src_processor_job['name'])
+    row_list = processor.produce(**args)
+    output_filename = args.get('output_filename',None)
+    if output_filename is not None:
+        # also write the intermediate file
+        _src_other.write_rows(
+            output_filename,row_list,args.get('output_format','text'),
+            args.get('output_stats_filename',None))
+    return row_list
+
+
+def iter_rows(src_processor_job):
+    '''
+    Same as produce_rows, except that, unless the src job also writes
+    an intermediate file, rows are produced one at a time, so that
+    only a single row needs to be in memory.
+
+    @returns {iterator} --- @see produce_rows
+    '''
+    args = src_processor_job['args']
+    if args.get('output_filename',None) is not None:
+        return iter(produce_rows(src_processor_job))
+    return _get_src_processor(src_processor_job['name']).iter_rows(**args)
+
+
+def _get_src_processor(processor_name):
+    '''
+    @returns {class} --- The src processor named processor_name.
+    '''
+    _load_src_modules()
+    processor = _src_get_processor(processor_name)
+    if (processor is None) or (not hasattr(processor,'produce')):
+        print (
+            '\nError: %s cannot be used as the input of a figure.\n' %
+            processor_name)
+        assert False
+    return processor
+
+
+def _load_src_modules():
+    '''
+    Imports src's modules.modules.get_processor, with every src
+    processor registered, and src's util.other.
+    '''
+    global _src_get_processor, _src_other, _src_module_dict
+    if _src_get_processor is not None:
+        return
+
+    figures_module_dict = _pop_shared_modules()
+    sys.path.insert(0,SRC_DIRECTORY)
+    try:
+        src_modules = importlib.import_module('modules.modules')
+        importlib.import_module('modules.single_node')
+        importlib.import_module('modules.distributed')
+        _src_other = importlib.import_module('util.other')
+        _src_get_processor = src_modules.get_processor
+        # src readers and writers report to the figures job running them
+        instrumentation.share_state(
+            importlib.import_module('util.instrumentation'))
+    finally:
+        sys.path.remove(SRC_DIRECTORY)
+        _src_module_dict = _pop_shared_modules()
+        sys.modules.update(figures_module_dict)
+
+
+def _pop_shared_modules():
+    '''
+    Removes the util and modules packages, and all their submodules,
+    from sys.modules.
+
+    @returns {dict} --- The removed entries of sys.modules.
+    '''
+    to_return = {}
+    for module_name in sys.modules.keys():
+        package_name = module_name.split('.')[0]
+        if package_name in _SHARED_PACKAGE_NAMES:
+            to_return[module_name] = sys.modules.pop(module_name)
+    return to_return
@@ -1,40 +1,57 @@
-import matplotlib.pyplot as plt
-import pylab
 import numpy
 import math
 
+from atomic_output import atomic_output_filename
+import box_stats
+import instrumentation
+from downsample import min_max_downsample
+from latency_stats import LatencyStatsTable
+
+'''
+Every plot gets its own Figure, drawn on an Agg canvas.  No pyplot
+state is shared between plots, so figure jobs need no display and can
+run in parallel processes (generate.py --jobs).
+
+Each output_filename can be a single file name or a list of them (eg.,
+['fig.png','fig.pdf','fig.svg']).  The figure is built once and then
+written in the format of each file's extension.
+
+matplotlib takes several times longer to import than any text report
+takes to run, so it only gets imported once a figure is drawn.
+'''
+
 BAR_CHART_COLOR_VEC = ['#c34343', # reddish
                        '#535050', # gray
                        ]
     
+@instrumentation.in_phase(instrumentation.PLOT_PHASE)
 def fairness(principal_list,xlabel,ylabel,output_filename):
     '''
-    @param {list} principal_list --- Each element is either a 0 or a
-    1.  0 if transaction by principal a, 1 if by principal b.
+    @param {list or numpy.ndarray} principal_list --- Each element
+    is either a 0 or a 1.  0 if transaction by principal a, 1 if by
+    principal b.
     '''
     
-    # note: I have little idea how the following code works.  It was
-    # mostly copied from the previous paper's scripts.  Check there if
-    # confused.
-    float_princ_list = map(
-        lambda princ_num : float(princ_num), principal_list)
-    window = pylab.ones(10)/10.0
-    rate = pylab.convolve(float_princ_list, window, 'same')
+    # rate is the share of principal b over a sliding window of 10
+    # transactions.
+    float_princ_array = numpy.asarray(principal_list,dtype=numpy.float64)
+    window = numpy.ones(10)/10.0
+    rate = numpy.convolve(float_princ_array, window, 'same')
 
 
-    _fairness_plot_set_defaults()
-    plt.plot(rate, color='red')
+    fig, ax = _fairness_plot_set_defaults()
+    _plot_line(fig, ax, rate, color='red')
     yticks = [-.1, 0, 0.2, 0.4, 0.6, 0.8, 1.0, 1.1]
     ylabels = ['', '0%', '20%', '40%', '60%', '80%', '100%', '']
 
-    plt.yticks(yticks, ylabels, fontsize=12)
-    # plt.xticks(xtiks, xlabels, fontsize=7)
-    plt.xlabel(xlabel, fontsize=16, verticalalignment='top')
-    plt.ylabel(ylabel, fontsize=18)
+    _set_yticks(ax, yticks, ylabels, fontsize=12)
+    ax.set_xlabel(xlabel, fontsize=16, verticalalignment='top')
+    ax.set_ylabel(ylabel, fontsize=18)
     
-    plt.savefig(output_filename)
+    _savefig(fig,output_filename)
 
     
+@instrumentation.in_phase(instrumentation.PLOT_PHASE)
 def box_and_whisker_throughput(throughput_results_list,
                                xlabel, ylabel,output_filename):
     '''
@@ -53,6 +70,7 @@ def box_and_whisker_throughput(throughput_results_list,
         str_num_switches,throughput_data,xlabel,ylabel,output_filename)
 
 
+@instrumentation.in_phase(instrumentation.PLOT_PHASE)
 def box_and_whisker_latency(latency_results_list,
                             xlabel, ylabel,output_filename):
     '''
@@ -62,14 +80,39 @@ def box_and_whisker_latency(latency_results_list,
     str_num_switches = map(
         lambda latency_result : str(latency_result.num_switches),
         latency_results_list)
-    latency_data = map(
-        lambda latency_result :
-            latency_result.latency_list_ms,
-        latency_results_list)
+    # every box's statistics in one pass
+    stats_dict_list = LatencyStatsTable(
+        latency_results_list).bxp_dict_list()
 
-    _box_and_whisker_raw(
-        str_num_switches,latency_data,xlabel,ylabel,output_filename)
+    _box_and_whisker_stats(
+        str_num_switches,stats_dict_list,xlabel,ylabel,output_filename)
 
+@instrumentation.in_phase(instrumentation.PLOT_PHASE)
+def box_and_whisker_latency_stats(latency_stats_list,
+                                  xlabel, ylabel,output_filename):
+    '''
+    Same as box_and_whisker_latency, but draws each box from
+    precomputed statistics instead of every latency, so takes the
+    same time no matter how many latencies there were.
+
+    @param {list} latency_stats_list --- Each element is a (a,b)
+    tuple.  a is the number of switches, b is an array of statistics
+    of latencies in ns (@see util.box_stats).  List is sorted in
+    ascending order.
+    '''
+    str_num_switches = map(
+        lambda num_switches_stats : str(num_switches_stats[0]),
+        latency_stats_list)
+    # ns to ms
+    stats_dict_list = map(
+        lambda num_switches_stats :
+            box_stats.to_bxp_dict(num_switches_stats[1],1/1000000.),
+        latency_stats_list)
+
+    _box_and_whisker_stats(
+        str_num_switches,stats_dict_list,xlabel,ylabel,output_filename)
+
+@instrumentation.in_phase(instrumentation.PLOT_PHASE)
 def scatter(x_data,y_data,xlabel,ylabel,output_filename):
     '''
     @param {list} x_data --- A list of numbers
@@ -77,26 +120,28 @@ def scatter(x_data,y_data,xlabel,ylabel,output_filename):
     @param {list} y_data --- A list of numbers.  Note len(x_data) must
     equal len(y_data)
     '''
-    _scatter_plot_set_defaults()
+    fig, ax = _scatter_plot_set_defaults()
 
-    plt.scatter(x_data,y_data)
-    plt.xlabel(xlabel, fontsize=16, verticalalignment='center')
-    plt.ylabel(ylabel, fontsize=18)
+    ax.scatter(x_data,y_data)
+    ax.set_xlabel(xlabel, fontsize=16, verticalalignment='center')
+    ax.set_ylabel(ylabel, fontsize=18)
     yticks = _create_y_ticks(max(y_data))
-    plt.yticks(yticks, yticks,fontsize=12)
+    _set_yticks(ax, yticks, yticks,fontsize=12)
     
-    plt.savefig(output_filename)
+    _savefig(fig,output_filename)
 
+@instrumentation.in_phase(instrumentation.PLOT_PHASE)
 def hist(data,xlabel,output_filename):
     '''
     @param {list} data --- A list of numbers
     '''
-    _hist_plot_set_defaults()
-    plt.hist(data)
-    plt.xlabel(xlabel, fontsize=18)
-    plt.savefig(output_filename)
+    fig, ax = _hist_plot_set_defaults()
+    ax.hist(data)
+    ax.set_xlabel(xlabel, fontsize=18)
+    _savefig(fig,output_filename)
 
     
+@instrumentation.in_phase(instrumentation.PLOT_PHASE)
 def bar_chart(conditions_data_list,conditions_legend_list,
               conditions_xtick_list,xlabel,ylabel,
               output_filename):
@@ -122,7 +167,7 @@ def bar_chart(conditions_data_list,conditions_legend_list,
     @param {list} conditions_xtick_list --- Each element is a string,
     corresponding to an x-axis label.
     '''
-    _bar_chart_set_defaults()
+    fig, ax = _bar_chart_set_defaults()
 
     num_conditions = len(conditions_data_list)
     num_xs = len(conditions_data_list[0])
@@ -140,30 +185,29 @@ def bar_chart(conditions_data_list,conditions_legend_list,
         condition_latency_result_list = conditions_data_list[i]
 
         # the average of each list of numbers in condition_data_list
-        data_type_means_list = map(
-            lambda latency_result : numpy.mean(latency_result.latency_list_ms),
-            condition_latency_result_list)
-        data_type_stddev_list = map(
-            lambda latency_result : numpy.std(latency_result.latency_list_ms),
+        condition_stats_table = LatencyStatsTable(
             condition_latency_result_list)
+        data_type_means_list = condition_stats_table.column('mean')
+        data_type_stddev_list = condition_stats_table.column('std')
         
         color = BAR_CHART_COLOR_VEC[ i % len(BAR_CHART_COLOR_VEC)]
-        rect = plt.bar(
+        rect = ax.bar(
             ind + i*width, data_type_means_list,
             width,color=color,yerr=data_type_stddev_list)
                 
         rect_list.append(rect)
 
     # add labels/legends
-    plt.ylabel(ylabel)
-    plt.xlabel(xlabel)
-    plt.xticks(ind+width,conditions_xtick_list,fontsize=12)
+    ax.set_ylabel(ylabel)
+    ax.set_xlabel(xlabel)
+    ax.set_xticks(ind+width)
+    ax.set_xticklabels(conditions_xtick_list,fontsize=12)
 
-    plt.figlegend( rect_list, conditions_legend_list, loc='upper center')
+    fig.legend( rect_list, conditions_legend_list, loc='upper center')
     for i in range(0,num_conditions):
-        _autolabel(plt,rect_list[i])
+        _autolabel(ax,rect_list[i])
 
-    plt.savefig(output_filename)
+    _savefig(fig,output_filename)
 
 
 def _autolabel(ax,rects):
@@ -186,31 +230,100 @@ def _box_and_whisker_raw(xtick_list,data_list,xlabel,ylabel,output_filename):
 
     @param {string} ylabel --- A label for the y axis
     '''
-    _box_and_whisker_plot_set_defaults()
-    bp = plt.boxplot(data_list,sym='',widths=.3)
-    plt.setp(bp['medians'], color='#000000', lw=2)
-    plt.setp(bp['boxes'], color='#808080', lw=1)
-    plt.setp(bp['caps'], color='#f03030', lw=1)
-    plt.setp(bp['whiskers'], color='#808080', lw=1, ls='-')
-
-    medians = [numpy.median(d) for d in data_list]
+    stats_dict_list = map(
+        lambda data : box_stats.to_bxp_dict(box_stats.box_stats(data)),
+        data_list)
+    _box_and_whisker_stats(
+        xtick_list,stats_dict_list,xlabel,ylabel,output_filename)
+
+
+def _box_and_whisker_stats(xtick_list,stats_dict_list,xlabel,ylabel,
+                           output_filename):
+    '''
+    @param {list} xtick_list --- @see _box_and_whisker_raw
+
+    @param {list} stats_dict_list --- Each element is a dict
+    describing one box (@see util.box_stats.to_bxp_dict).  Boxes are
+    drawn from these alone: no data gets sorted.
+    '''
+    from matplotlib.artist import setp
+
+    fig, ax = _box_and_whisker_plot_set_defaults()
+    bp = ax.bxp(stats_dict_list,widths=.3,showfliers=False)
+    setp(bp['medians'], color='#000000', lw=2)
+    setp(bp['boxes'], color='#808080', lw=1)
+    setp(bp['caps'], color='#f03030', lw=1)
+    setp(bp['whiskers'], color='#808080', lw=1, ls='-')
+
+    medians = [stats_dict['med'] for stats_dict in stats_dict_list]
     for i in range(0, len(medians)):
-        plt.text(
+        ax.text(
             i+1.22, medians[i], str(round(medians[i],2)), fontsize=12,
             verticalalignment='center')
 
     # x-y labels
-    plt.xlabel(xlabel, fontsize=16, verticalalignment='top')
-    plt.ylabel(ylabel, fontsize=16, multialignment='center')
+    ax.set_xlabel(xlabel, fontsize=16, verticalalignment='top')
+    ax.set_ylabel(ylabel, fontsize=16, multialignment='center')
 
     # x-y ticks
-    yticks = _create_y_ticks(max(max(data_list)))
-    plt.yticks(yticks, map(str, yticks), fontsize=12)
-    plt.xticks(numpy.arange(1, 2+len(xtick_list)), xtick_list, fontsize=12)
+    yticks = _create_y_ticks(
+        max([stats_dict['max'] for stats_dict in stats_dict_list]))
+    _set_yticks(ax, yticks, map(str, yticks), fontsize=12)
+    ax.set_xticks(numpy.arange(1, 2+len(xtick_list)))
+    ax.set_xticklabels(xtick_list, fontsize=12)
 
-    plt.savefig(output_filename)    
+    _savefig(fig,output_filename)
     
 
+def _plot_line(fig,ax,y_data,x_data=None,**kwargs):
+    '''
+    Same as ax.plot(x_data,y_data,**kwargs), except that the line is
+    first cut down to the lowest and highest point of each pixel
+    column of ax (@see util.downsample).  Long lines look the same,
+    but take time and vector file space in proportion to the width of
+    ax instead of to their length.
+
+    @param {list or numpy.ndarray or None} x_data --- In ascending
+    order.  None means 0, 1, 2, ..., as with ax.plot(y_data).
+    '''
+    from matplotlib import rcParams
+
+    dpi = rcParams['savefig.dpi']
+    if dpi == 'figure':
+        dpi = fig.dpi
+    width_pixels = ax.get_position().width * fig.get_figwidth() * dpi
+    x_array, y_array = min_max_downsample(
+        y_data,max(int(math.ceil(width_pixels)),1),x_data)
+    return ax.plot(x_array,y_array,**kwargs)
+
+
+def _set_yticks(ax,yticks,ylabels,**kwargs):
+    '''
+    Same as pyplot.yticks(yticks,ylabels,**kwargs), for ax.
+    '''
+    ax.set_yticks(yticks)
+    ax.set_yticklabels(ylabels,**kwargs)
+
+
+def _savefig(fig,output_filename):
+    '''
+    Saves fig so that each output file only appears once it is
+    completely written.
+
+    @param {Figure} fig --- The figure to save.
+
+    @param {String or list} output_filename --- A file name, or a
+    list of file names.  Each file's format is taken from its
+    extension, as with Figure.savefig.  fig is built only once, however
+    many formats it is saved in.
+    '''
+    if isinstance(output_filename,basestring):
+        output_filename = [output_filename]
+    for single_output_filename in output_filename:
+        with atomic_output_filename(single_output_filename) as tmp_filename:
+            fig.savefig(tmp_filename)
+
+
 def _create_y_ticks(max_y):
 
     ytikmax = int(math.ceil(max_y))
@@ -240,25 +353,34 @@ def _create_y_ticks(max_y):
     
     
 def _box_and_whisker_plot_set_defaults():
-    plt.clf()
-    fig = plt.figure(1)
+    '''
+    @returns {2-tuple} (a,b) --- a is a new Figure, on its own Agg
+    canvas, b is its single Axes.
+    '''
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
     fig.set_size_inches(6, 2.5)
-    plt.subplots_adjust(left=0.15, right=0.98, bottom=0.25, top=0.95)
+    fig.subplots_adjust(left=0.15, right=0.98, bottom=0.25, top=0.95)
+    return fig, fig.add_subplot(111)
 
 def _bar_chart_set_defaults():
     # currently, bar chart defaults are same as box and whisker.
-    _box_and_whisker_plot_set_defaults()
+    return _box_and_whisker_plot_set_defaults()
     
 def _scatter_plot_set_defaults():
     # currently, scatter defaults are same as box and whisker.
-    _box_and_whisker_plot_set_defaults()
+    return _box_and_whisker_plot_set_defaults()
 
 def _hist_plot_set_defaults():
     # currently, hist defaults are same as box and whisker.
-    _box_and_whisker_plot_set_defaults()
+    return _box_and_whisker_plot_set_defaults()
     
 def _fairness_plot_set_defaults():
     # currently, fairness defaults are same as box and whisker.
-    _box_and_whisker_plot_set_defaults()
+    fig, ax = _box_and_whisker_plot_set_defaults()
     # The last digit of the 2000 x label was cut off with right=0.98
-    plt.subplots_adjust(left=0.15, right=0.96, bottom=0.25, top=0.95)
+    fig.subplots_adjust(left=0.15, right=0.96, bottom=0.25, top=0.95)
+    return fig, ax
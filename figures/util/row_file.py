@@ -0,0 +1,153 @@
+import numpy
+
+import instrumentation
+
+'''
+Compact binary alternative to the #,#,#,... intermediate files that
+src processors write and figures readers read.
+
+Each row has an integer key (eg., number of switches or artificial
+rtt in ns; possibly several, eg., speculation flag and rtt) and an
+array of values.  Layout:
+
+    MAGIC (8 bytes)
+    header: 4 little-endian int64s: value dtype code, key width,
+        number of rows, byte offset of footer
+    values: every row's values back to back, little-endian int64 or
+        float64 (per value dtype code)
+    footer: keys (number of rows * key width int64s), then offsets
+        (number of rows + 1 int64s).  Row i's values are
+        values[offsets[i]:offsets[i+1]].
+
+The footer comes last so that rows can be written as they are
+produced.  Readers memory-map the values, so loading a row file does
+not copy or parse row data.
+
+This module is shared, unchanged, between src and figures.
+'''
+
+MAGIC = 'SGROWS1\n'
+
+_INDEX_DTYPE = numpy.dtype('<i8')
+_HEADER_LENGTH = 4
+_VALUE_DTYPE_LIST = [numpy.dtype('<i8'),numpy.dtype('<f8')]
+_DATA_START = len(MAGIC) + _HEADER_LENGTH * _INDEX_DTYPE.itemsize
+
+
+def is_row_file(filename):
+    '''
+    @returns {bool} --- True if filename is a binary row file, False
+    if it is anything else (eg., a text file).
+    '''
+    with open(filename,'rb') as fd:
+        return fd.read(len(MAGIC)) == MAGIC
+
+
+def read_row_file(filename):
+    '''
+    @param {String} filename --- Name of binary row file.
+
+    @returns {list} --- Each element is a (a,b) tuple.  a is the row's
+    key: an int for files with a single key per row, otherwise a
+    tuple of ints.  b is a read-only array of the row's values,
+    memory-mapped from filename.
+    '''
+    with open(filename,'rb') as fd:
+        if fd.read(len(MAGIC)) != MAGIC:
+            raise ValueError('%s is not a binary row file' % filename)
+        header = numpy.fromfile(fd,dtype=_INDEX_DTYPE,count=_HEADER_LENGTH)
+        dtype_code, key_width, num_rows, footer_start = [
+            int(field) for field in header]
+
+        fd.seek(footer_start)
+        keys = numpy.fromfile(
+            fd,dtype=_INDEX_DTYPE,count=num_rows*key_width).reshape(
+            num_rows,key_width)
+        offsets = numpy.fromfile(fd,dtype=_INDEX_DTYPE,count=num_rows+1)
+
+    # memory-mapped: pages are read as they are touched
+    instrumentation.count_file_read(filename)
+    num_values = int(offsets[-1])
+    if num_values == 0:
+        values = numpy.empty(0,dtype=_VALUE_DTYPE_LIST[dtype_code])
+    else:
+        values = numpy.memmap(
+            filename,dtype=_VALUE_DTYPE_LIST[dtype_code],mode='r',
+            offset=_DATA_START,shape=(num_values,))
+
+    to_return = []
+    for i in range(0,num_rows):
+        if key_width == 1:
+            row_key = int(keys[i][0])
+        else:
+            row_key = tuple(int(key) for key in keys[i])
+        to_return.append((row_key,values[offsets[i]:offsets[i+1]]))
+    return to_return
+
+
+class RowFileWriter(object):
+    def __init__(self,fd,value_dtype=None,key_width=1):
+        '''
+        @param {file} fd --- Binary file object to write to, positioned
+        at its start.
+
+        @param {numpy.dtype or None} value_dtype --- Either int64 or
+        float64.  Every row's values get stored as this type.  If None,
+        int64 if the first row's values are integers and float64
+        otherwise.
+
+        @param {int} key_width --- Number of ints in each row's key.
+        '''
+        self.fd = fd
+        self.value_dtype = None
+        if value_dtype is not None:
+            self.value_dtype = numpy.dtype(value_dtype).newbyteorder('<')
+        self.key_width = key_width
+        self.key_list = []
+        self.offset_list = [0]
+
+        self.fd.write(MAGIC)
+        # header gets rewritten by close, once lengths are known
+        numpy.zeros(_HEADER_LENGTH,dtype=_INDEX_DTYPE).tofile(self.fd)
+
+    @instrumentation.in_phase(instrumentation.WRITE_PHASE)
+    def write_row(self,row_key,row_values):
+        '''
+        @param {int or tuple} row_key --- An int if key_width is 1,
+        otherwise a tuple of key_width ints.
+
+        @param {list or numpy.ndarray} row_values --- Numbers to
+        store.
+        '''
+        if self.key_width == 1:
+            row_key = (row_key,)
+        self.key_list.append(row_key)
+        row_values = numpy.asarray(row_values)
+        if self.value_dtype is None:
+            self.value_dtype = _VALUE_DTYPE_LIST[
+                0 if row_values.dtype.kind in 'iub' else 1]
+        row_values = row_values.astype(self.value_dtype,copy=False)
+        row_values.tofile(self.fd)
+        self.offset_list.append(self.offset_list[-1] + len(row_values))
+
+    def close(self):
+        '''
+        Writes the footer and header.  Does not close fd.
+        '''
+        if self.value_dtype is None:
+            # no rows
+            self.value_dtype = _VALUE_DTYPE_LIST[0]
+        footer_start = self.fd.tell()
+        numpy.array(
+            self.key_list,dtype=_INDEX_DTYPE).reshape(
+            len(self.key_list),self.key_width).tofile(self.fd)
+        numpy.array(self.offset_list,dtype=_INDEX_DTYPE).tofile(self.fd)
+
+        dtype_code = [
+            dtype.kind for dtype in _VALUE_DTYPE_LIST].index(
+            self.value_dtype.kind)
+        self.fd.seek(len(MAGIC))
+        numpy.array(
+            [dtype_code,self.key_width,len(self.key_list),footer_start],
+            dtype=_INDEX_DTYPE).tofile(self.fd)
+        self.fd.seek(0,2)
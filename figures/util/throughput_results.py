@@ -1,16 +1,24 @@
+import numpy
 
 class ThroughputResult(object):
+    # one array per result, converted to ks/s only on demand
+    __slots__ = ['num_switches','throughput_array']
+
     def __init__(self,num_switches,throughput_list):
         '''
         @param {int} num_switches --- The number of switches used in
         the experiment.
 
-        @param {list} throughput_list --- A list of floats.  Each
-        float is ops/s.
+        @param {list or numpy.ndarray} throughput_list --- Each
+        element is ops/s.  Arrays are kept without being copied.
         '''
         self.num_switches = num_switches
-        self.throughput_list = throughput_list
+        self.throughput_array = numpy.asarray(throughput_list)
+
+    @property
+    def throughput_list(self):
+        return self.throughput_array
 
-        self.throughput_list_ks_per_second = map(
-            lambda throughput_num: throughput_num/1000.,
-            throughput_list)
+    @property
+    def throughput_list_ks_per_second(self):
+        return self.throughput_array / 1000.
@@ -1,19 +1,173 @@
 #!/usr/bin/env python
 import argparse
+import functools
+import json
+import multiprocessing
+import os
 import sys
+import traceback
 
+from util.atomic_output import atomic_open
 from util.cfg_reader import read_config
+import util.instrumentation as instrumentation
+import util.fingerprint as fingerprint
 import modules.modules
 from modules.modules import get_processor
 
-import modules.distributed
-import modules.single_node
-
 def run():
-    config_list = parse_cfg()
-    for processor_job in config_list:
-        processor = get_processor(processor_job['name'])
+    config_list, args = parse_cfg()
+    num_jobs = args.jobs
+
+    # skip jobs that already produced up-to-date outputs
+    fingerprint_store = fingerprint.FingerprintStore(
+        fingerprint.fingerprint_store_filename(args.cfg))
+    code_stamp_list = fingerprint.code_stamp(
+        os.path.dirname(os.path.abspath(__file__)))
+
+    instrument = (args.report is not None) or (args.profile_dir is not None)
+    job_function = functools.partial(
+        run_job,instrument=instrument,profile_dir=args.profile_dir)
+    pool = None
+    if num_jobs == 1:
+        # one job at a time, in config order
+        stage_list = [[index] for index in range(0,len(config_list))]
+    else:
+        # jobs of a stage run at once, in separate processes, once
+        # every job whose outputs they read has finished.
+        stage_list = fingerprint.job_stage_list(config_list)
+        pool = multiprocessing.Pool(num_jobs)
+
+    fingerprint_list = [None for processor_job in config_list]
+    indexed_job_list = []
+    result_list = []
+    try:
+        for stage in stage_list:
+            stage_job_list = []
+            for index in stage:
+                processor_job = config_list[index]
+                # only now are outputs of earlier jobs it reads final
+                fingerprint_list[index] = fingerprint.job_fingerprint(
+                    processor_job,code_stamp_list)
+                output_filename_list = fingerprint.job_filenames(
+                    processor_job['args'])[1]
+                if ((not args.force) and
+                    fingerprint_store.is_up_to_date(
+                        fingerprint_list[index],output_filename_list)):
+                    print 'Skipping up-to-date job %i (%s)' % (
+                        index,processor_job['name'])
+                else:
+                    stage_job_list.append((index,processor_job))
+
+            if pool is None:
+                stage_result_list = map(job_function,stage_job_list)
+            else:
+                stage_result_list = pool.map(
+                    job_function,stage_job_list,chunksize=1)
+
+            for (index, processor_job), (failure, job_dict) in zip(
+                stage_job_list,stage_result_list):
+                if failure is None:
+                    fingerprint_store.record(
+                        fingerprint_list[index],
+                        fingerprint.job_filenames(processor_job['args'])[1])
+            indexed_job_list.extend(stage_job_list)
+            result_list.extend(stage_result_list)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    fingerprint_store.save(fingerprint_list)
+
+    failure_list = [
+        failure for failure, job_dict in result_list if failure is not None]
+    if instrument:
+        save_report(args,config_list,indexed_job_list,result_list)
+
+    for index, processor_name, traceback_string in failure_list:
+        print '\nJob %i (%s) failed:\n%s' % (
+            index,processor_name,traceback_string)
+    if len(failure_list) != 0:
+        print '\n%i of %i jobs failed.\n' % (
+            len(failure_list),len(config_list))
+        sys.exit(-1)
+
+
+def run_job(indexed_processor_job,instrument=False,profile_dir=None):
+    '''
+    @param {2-tuple} indexed_processor_job --- (a,b).  a is the index
+    of the job in the config file, b is the job's configuration.
+
+    @param {bool} instrument --- True to record the job (@see
+    util.instrumentation).
+
+    @param {String or None} profile_dir --- If not None, save the
+    job's cProfile stats to a file in this directory.  Requires
+    instrument.
+
+    @returns {2-tuple} (a,b) --- a is None if the job succeeded.
+    Otherwise, a is a (c,d,e) tuple: c is the index of the job in the
+    config file, d is the job's processor name, and e is a string
+    containing the traceback of the failure.  Failures do not stop
+    other jobs from running.  b is the dict of the job's
+    instrumentation.JobRecord, or None if not instrumented.
+    '''
+    index, processor_job = indexed_processor_job
+    processor_name = processor_job.get('name',None)
+    if not instrument:
+        return _run_processor(index,processor_job), None
+
+    profile_filename = None
+    if profile_dir is not None:
+        profile_filename = instrumentation.profile_filename(
+            profile_dir,index,processor_name)
+    with instrumentation.record_job(
+        index,processor_name,profile_filename) as job_record:
+        failure = _run_processor(index,processor_job)
+    # _run_processor catches the job's exceptions
+    job_record.succeeded = failure is None
+    return failure, job_record.to_dict()
+
+
+def _run_processor(index,processor_job):
+    '''
+    @returns {3-tuple or None} --- @see run_job's a.
+    '''
+    processor_name = processor_job.get('name',None)
+    try:
+        # processor modules are only imported once needed
+        with instrumentation.phase(instrumentation.IMPORT_PHASE):
+            processor = get_processor(processor_name)
+        if processor is None:
+            raise ValueError('Unknown processor %s' % processor_name)
         processor.run(**processor_job['args'])
+    except Exception:
+        return (index,processor_name,traceback.format_exc())
+    return None
+
+
+def save_report(args,config_list,indexed_job_list,result_list):
+    '''
+    Saves what was recorded about every job that ran to args.report,
+    as json, and keeps the cProfile stats of the slowest jobs.
+    '''
+    job_dict_list = [job_dict for failure, job_dict in result_list]
+    if args.profile_dir is not None:
+        instrumentation.keep_slowest_profiles(
+            job_dict_list,args.profile_dir,args.profile_top)
+    if args.report is None:
+        return
+
+    ran_index_set = set([index for index, processor_job in indexed_job_list])
+    report = {
+        'cfg': os.path.abspath(args.cfg),
+        'job_list': job_dict_list,
+        # jobs whose outputs were already up to date
+        'skipped_index_list': [
+            index for index in range(0,len(config_list))
+            if index not in ran_index_set],
+        }
+    with atomic_open(args.report) as fd:
+        json.dump(report,fd,indent=1,sort_keys=True)
     
 
 def parse_cfg():
@@ -24,17 +178,44 @@ Use this script to process experimental data.
     parser.add_argument(
         '--cfg',
         help='Configuration filename (should be json)')
+    parser.add_argument(
+        '--jobs',type=int,default=1,
+        help=('Number of processor jobs to run in parallel.  Jobs that '
+              'read files other jobs write wait for those jobs'))
+    parser.add_argument(
+        '--force',action='store_true',
+        help='Rerun every job, even those whose outputs are up to date')
+    parser.add_argument(
+        '--report',
+        help=('Json filename to save each job\'s timings, counts of '
+              'bytes and numbers read and written, and peak memory to'))
+    parser.add_argument(
+        '--profile-dir',
+        help='Directory to save cProfile stats of the slowest jobs to')
+    parser.add_argument(
+        '--profile-top',type=int,default=3,
+        help='Number of slowest jobs to keep cProfile stats of')
     args = parser.parse_args()
     
 
     if args.cfg is None:
         print '\nRequire a configuration filename.\n'
         sys.exit(-1)
-    else:
-        cfg_filename = args.cfg
 
-    config_list = read_config(cfg_filename)
-    return config_list
+    if args.jobs < 1:
+        print '\n--jobs must be at least 1.\n'
+        sys.exit(-1)
+
+    if args.profile_top < 0:
+        print '\n--profile-top cannot be negative.\n'
+        sys.exit(-1)
+
+    if ((args.profile_dir is not None) and
+        (not os.path.isdir(args.profile_dir))):
+        os.makedirs(args.profile_dir)
+
+    config_list = read_config(args.cfg)
+    return config_list, args
     
     
 if __name__ == '__main__':
@@ -1,9 +1,22 @@
-import sys
+import contextlib
+import itertools
 import os
+import shutil
+import sys
+
+import numpy
 
 from util.file_readers import read_latencies, read_throughputs
+from util.file_readers import read_throughput_series, throughputs_from_series
+from util.file_readers import SAMPLE_LENGTH_SECONDS, DEFAULT_WARMUP_FRACTION
+from util.file_readers import cache_trace
 from util.file_readers import read_throughputs_produce_latencies
 import util.other as other
+from util.atomic_output import atomic_open
+from util.compressed import open_input
+import util.instrumentation as instrumentation
+from util.row_writer import open_row_writer
+from util.parallel import imap_ordered
 
 from modules import register_processor
 
@@ -30,6 +43,20 @@ class LatencyProcessor(object):
         where the first number of a line is the number of switches in the
         experiment and the subsequent numbers in the line represent the
         time, in ns, that an op took.
+
+        @param {String} output_format --- Optional.  'text' (default)
+        for the format above, or 'binary' for the equivalent, much
+        smaller, util.row_file format.
+
+        @param {String} output_stats_filename --- Optional.  If set,
+        also save the statistics needed to draw a box and whisker plot
+        of each line's latencies to this file, in the same format
+        (@see util.other.write_rows).
+
+        @param {float or String} warmup_fraction --- Optional.  Fraction
+        of each trace to drop as warmup, or 'auto' to choose each
+        switch's cut from its own data (@see util.steady_state).
+        Defaults to util.file_readers.DEFAULT_WARMUP_FRACTION.
         '''
         latency_filename = kwargs.get('latency_filename',None)
         output_filename = kwargs.get('output_filename',None)
@@ -37,12 +64,37 @@ class LatencyProcessor(object):
         if (latency_filename is None) or (output_filename is None):
             assert False
 
-        output_string = '1,'
-        latency_list = read_latencies(latency_filename)
-        output_string += other.num_list_to_string(latency_list) + '\n'
+        other.write_rows(
+            output_filename,LatencyProcessor.iter_rows(**kwargs),
+            kwargs.get('output_format','text'),
+            kwargs.get('output_stats_filename',None))
+
+    @staticmethod
+    def produce(**kwargs):
+        '''
+        Same as run, except does not need, or write to,
+        output_filename.
+
+        @returns {list} --- The single row that run writes to
+        output_filename, as a (a,b) tuple: a is 1, b is an array of op
+        latencies, in ns.
+        '''
+        return list(LatencyProcessor.iter_rows(**kwargs))
 
-        with open(output_filename,'w') as fd:
-            fd.write(output_string)
+    @staticmethod
+    def iter_rows(**kwargs):
+        '''
+        @returns {generator} --- Yields the rows of produce one at a
+        time, so that only a single row needs to be in memory.
+        '''
+        latency_filename = kwargs.get('latency_filename',None)
+        if latency_filename is None:
+            assert False
+
+        latency_series = read_latencies(
+            latency_filename,
+            kwargs.get('warmup_fraction',DEFAULT_WARMUP_FRACTION))
+        yield (1,latency_series.array)
         
 @register_processor
 class ThroughputProcessor(object):
@@ -68,6 +120,30 @@ class ThroughputProcessor(object):
         where the first number of a line is the number of switches in the
         experiment and the subsequent numbers in the line represent the
         number of operations in seconds.
+
+        @param {list} series_output_list --- Optional.  Each element
+        is a dict describing an extra time series of throughputs to
+        save.  'sample_length_seconds' points to the bin length (eg.,
+        .01), 'output_filename' points to the file to save to, and
+        'per_switch' (optional, default False) points to a bool.  All
+        series are computed from the same read of each input file.
+        @see util.other.write_throughput_series for the format of
+        each line; lines appear in the order of input_tuple_list.
+
+        @param {String} output_format --- Optional.  'text' (default)
+        for the format above, or 'binary' for the equivalent, much
+        smaller, util.row_file format.
+
+        @param {int} num_workers --- Optional.  Maximum number of input
+        files to parse at once, each in its own process.  Defaults to
+        the number of cpus.  Workers only write each file's trace
+        cache (@see util.file_readers.cache_trace), so files are still
+        read, and rows held in memory, one at a time.
+
+        @param {float or String} warmup_fraction --- Optional.  Fraction
+        of each trace to drop as warmup, or 'auto' to choose each
+        switch's cut from its own data (@see util.steady_state).
+        Defaults to util.file_readers.DEFAULT_WARMUP_FRACTION.
         '''
         output_filename = kwargs.get('output_filename',None)
         input_tuple_list = kwargs.get('input_tuple_list',None)
@@ -75,18 +151,70 @@ class ThroughputProcessor(object):
         if ((input_tuple_list is None) or (output_filename is None)):
             assert False
 
-        output_string = ''
-        for filename_num_switches_tuple in input_tuple_list:
-            num_switches = filename_num_switches_tuple['num_switches']
-            throughput_input_filename = filename_num_switches_tuple['filename']
+        other.write_rows(
+            output_filename,ThroughputProcessor.iter_rows(**kwargs),
+            kwargs.get('output_format','text'))
+
+    @staticmethod
+    def produce(**kwargs):
+        '''
+        Same as run, except does not need, or write to,
+        output_filename.  Still writes every series in
+        series_output_list.
+
+        @returns {list} --- The rows that run writes to
+        output_filename.  Each element is a (a,b) tuple: a is the
+        number of switches, b is an array of throughputs, in ops/s.
+        '''
+        return list(ThroughputProcessor.iter_rows(**kwargs))
+
+    @staticmethod
+    def iter_rows(**kwargs):
+        '''
+        @returns {generator} --- Yields the rows of produce one at a
+        time, so that only a single row needs to be in memory.
+        '''
+        input_tuple_list = kwargs.get('input_tuple_list',None)
+        series_output_list = kwargs.get('series_output_list',[])
+
+        if input_tuple_list is None:
+            assert False
+
+        sample_length_seconds_list = [SAMPLE_LENGTH_SECONDS] + [
+            series_output['sample_length_seconds']
+            for series_output in series_output_list]
 
-            throughput_list = read_throughputs(throughput_input_filename)
-            output_string += str(num_switches) + ','
-            # add string list to output string
-            output_string += other.num_list_to_string(throughput_list) + '\n'
+        # series are written as each input file is read
+        series_writer_context = contextlib.nested(*[
+            open_row_writer(series_output['output_filename'])
+            for series_output in series_output_list])
+        # input files are parsed into their trace caches in parallel;
+        # only then is each one read, here, one at a time.
+        cached_iter = imap_ordered(
+            cache_trace,
+            [(filename_num_switches_tuple['filename'],)
+             for filename_num_switches_tuple in input_tuple_list],
+            kwargs.get('num_workers',None))
+        with series_writer_context as series_writer_list:
+            for filename_num_switches_tuple, cached in itertools.izip(
+                input_tuple_list,cached_iter):
+                num_switches = filename_num_switches_tuple['num_switches']
+                throughput_series_dict = read_throughput_series(
+                    filename_num_switches_tuple['filename'],
+                    sample_length_seconds_list,
+                    kwargs.get('warmup_fraction',DEFAULT_WARMUP_FRACTION))
 
-        with open(output_filename,'w') as fd:
-            fd.write(output_string)
+                for series_output, series_writer in zip(
+                    series_output_list,series_writer_list):
+                    other.write_throughput_series(
+                        series_writer,num_switches,
+                        throughput_series_dict[
+                            series_output['sample_length_seconds']],
+                        series_output.get('per_switch',False))
+
+                throughput_list = throughputs_from_series(
+                    throughput_series_dict[SAMPLE_LENGTH_SECONDS])
+                yield (num_switches,numpy.array(throughput_list))
 
 @register_processor
 class FairnessProcessor(object):
@@ -119,22 +247,22 @@ class FairnessProcessor(object):
         if (output_filename is None) or (input_tuple_list is None):
             assert False
         
-        for input_tuple in input_tuple_list:
-            wound_wait_on = input_tuple['wound_wait_on']
-            wound_wait_on_string = 'wound_wait' if wound_wait_on else 'ralph'
-            fairness_filename = input_tupe['filename']
-
-            if wound_wait_on:
-                output_string += '0'
-            else:
-                output_string += '1'
-            output_string += ','
-            with open(fairness_filename,'r') as fd:
-                output_string += fd.read()
-            output_string += '\n'
-
-        with open(output_filename,'w') as fd:
-            fd.write(output_string)
+        # copying the traces is all the work there is
+        with instrumentation.phase(instrumentation.WRITE_PHASE), \
+             atomic_open(output_filename) as output_fd:
+            for input_tuple in input_tuple_list:
+                wound_wait_on = input_tuple['wound_wait_on']
+                fairness_filename = input_tuple['filename']
+
+                if wound_wait_on:
+                    output_fd.write('0')
+                else:
+                    output_fd.write('1')
+                output_fd.write(',')
+                # copy in blocks instead of reading the whole file
+                with open_input(fairness_filename) as fd:
+                    shutil.copyfileobj(fd,output_fd)
+                output_fd.write('\n')
     
 
 # From python3 statistics module
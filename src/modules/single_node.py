@@ -1,8 +1,21 @@
-import sys
+import contextlib
+import itertools
 import os
+import shutil
+import sys
+
+import numpy
 
 from util.file_readers import read_latencies, read_throughputs
+from util.file_readers import read_throughput_series, throughputs_from_series
+from util.file_readers import SAMPLE_LENGTH_SECONDS, DEFAULT_WARMUP_FRACTION
+from util.file_readers import cache_trace
 import util.other as other
+from util.atomic_output import atomic_open
+from util.compressed import open_input
+import util.instrumentation as instrumentation
+from util.row_writer import open_row_writer
+from util.parallel import imap_ordered
 
 from modules import register_processor
 
@@ -39,23 +52,22 @@ class FairnessProcessor(object):
         if ((input_tuple_list is None) or (output_filename is None)):
             assert False
 
-        output_string = ''
-        for wound_wait_filename in input_tuple_list:
-            wound_wait_on = wound_wait_filename['wound_wait_on']
-            wound_wait_on_string = 'true' if wound_wait_on else 'false'
-            fairness_filename = wound_wait_filename['filename']
-            
-            if wound_wait_on:
-                output_string += '0'
-            else:
-                output_string += '1'
-            output_string += ','
-            with open(fairness_filename,'r') as fd:
-                output_string += fd.read()
-            output_string += '\n'
-
-        with open(output_filename,'w') as fd:
-            fd.write(output_string)
+        # copying the traces is all the work there is
+        with instrumentation.phase(instrumentation.WRITE_PHASE), \
+             atomic_open(output_filename) as output_fd:
+            for wound_wait_filename in input_tuple_list:
+                wound_wait_on = wound_wait_filename['wound_wait_on']
+                fairness_filename = wound_wait_filename['filename']
+
+                if wound_wait_on:
+                    output_fd.write('0')
+                else:
+                    output_fd.write('1')
+                output_fd.write(',')
+                # copy in blocks instead of reading the whole file
+                with open_input(fairness_filename) as fd:
+                    shutil.copyfileobj(fd,output_fd)
+                output_fd.write('\n')
 
 
 @register_processor
@@ -81,6 +93,30 @@ class ThroughputProcessor(object):
         where the first number of a line is the number of switches in the
         experiment and the subsequent numbers in the line represent the
         number of operations per second.
+
+        @param {list} series_output_list --- Optional.  Each element
+        is a dict describing an extra time series of throughputs to
+        save.  'sample_length_seconds' points to the bin length (eg.,
+        .01), 'output_filename' points to the file to save to, and
+        'per_switch' (optional, default False) points to a bool.  All
+        series are computed from the same read of each input file.
+        @see util.other.write_throughput_series for the format of
+        each line; lines appear in the order of input_tuple_list.
+
+        @param {String} output_format --- Optional.  'text' (default)
+        for the format above, or 'binary' for the equivalent, much
+        smaller, util.row_file format.
+
+        @param {int} num_workers --- Optional.  Maximum number of input
+        files to parse at once, each in its own process.  Defaults to
+        the number of cpus.  Workers only write each file's trace
+        cache (@see util.file_readers.cache_trace), so files are still
+        read, and rows held in memory, one at a time.
+
+        @param {float or String} warmup_fraction --- Optional.  Fraction
+        of each trace to drop as warmup, or 'auto' to choose each
+        switch's cut from its own data (@see util.steady_state).
+        Defaults to util.file_readers.DEFAULT_WARMUP_FRACTION.
         '''
         output_filename = kwargs.get('output_filename',None)
         input_tuple_list = kwargs.get('input_tuple_list',None)
@@ -88,18 +124,70 @@ class ThroughputProcessor(object):
         if ((input_tuple_list is None) or (output_filename is None)):
             assert False
 
-        output_string = ''
-        for filename_num_switches_tuple in input_tuple_list:
-            num_switches = filename_num_switches_tuple['num_switches']
-            throughput_input_filename = filename_num_switches_tuple['filename']
+        other.write_rows(
+            output_filename,ThroughputProcessor.iter_rows(**kwargs),
+            kwargs.get('output_format','text'))
+
+    @staticmethod
+    def produce(**kwargs):
+        '''
+        Same as run, except does not need, or write to,
+        output_filename.  Still writes every series in
+        series_output_list.
+
+        @returns {list} --- The rows that run writes to
+        output_filename.  Each element is a (a,b) tuple: a is the
+        number of switches, b is an array of throughputs, in ops/s.
+        '''
+        return list(ThroughputProcessor.iter_rows(**kwargs))
+
+    @staticmethod
+    def iter_rows(**kwargs):
+        '''
+        @returns {generator} --- Yields the rows of produce one at a
+        time, so that only a single row needs to be in memory.
+        '''
+        input_tuple_list = kwargs.get('input_tuple_list',None)
+        series_output_list = kwargs.get('series_output_list',[])
 
-            throughput_list = read_throughputs(throughput_input_filename)
-            output_string += str(num_switches) + ','
-            # add string list to output string
-            output_string += other.num_list_to_string(throughput_list) + '\n'
+        if input_tuple_list is None:
+            assert False
 
-        with open(output_filename,'w') as fd:
-            fd.write(output_string)
+        sample_length_seconds_list = [SAMPLE_LENGTH_SECONDS] + [
+            series_output['sample_length_seconds']
+            for series_output in series_output_list]
+
+        # series are written as each input file is read
+        series_writer_context = contextlib.nested(*[
+            open_row_writer(series_output['output_filename'])
+            for series_output in series_output_list])
+        # input files are parsed into their trace caches in parallel;
+        # only then is each one read, here, one at a time.
+        cached_iter = imap_ordered(
+            cache_trace,
+            [(filename_num_switches_tuple['filename'],)
+             for filename_num_switches_tuple in input_tuple_list],
+            kwargs.get('num_workers',None))
+        with series_writer_context as series_writer_list:
+            for filename_num_switches_tuple, cached in itertools.izip(
+                input_tuple_list,cached_iter):
+                num_switches = filename_num_switches_tuple['num_switches']
+                throughput_series_dict = read_throughput_series(
+                    filename_num_switches_tuple['filename'],
+                    sample_length_seconds_list,
+                    kwargs.get('warmup_fraction',DEFAULT_WARMUP_FRACTION))
+
+                for series_output, series_writer in zip(
+                    series_output_list,series_writer_list):
+                    other.write_throughput_series(
+                        series_writer,num_switches,
+                        throughput_series_dict[
+                            series_output['sample_length_seconds']],
+                        series_output.get('per_switch',False))
+
+                throughput_list = throughputs_from_series(
+                    throughput_series_dict[SAMPLE_LENGTH_SECONDS])
+                yield (num_switches,numpy.array(throughput_list))
 
 @register_processor
 class ReadOnlyProcessor(object):
@@ -120,14 +208,56 @@ class ReadOnlyProcessor(object):
         where the first number of a line is the number of switches in the
         experiment and the subsequent numbers in the line represent the
         time, in ns, that an op took.
+
+        @param {String} output_format --- Optional.  'text' (default)
+        for the format above, or 'binary' for the equivalent, much
+        smaller, util.row_file format.
+
+        @param {String} output_stats_filename --- Optional.  If set,
+        also save the statistics needed to draw a box and whisker plot
+        of each line's latencies to this file, in the same format
+        (@see util.other.write_rows).
+
+        @param {float or String} warmup_fraction --- Optional.  Fraction
+        of each trace to drop as warmup, or 'auto' to choose each
+        switch's cut from its own data (@see util.steady_state).
+        Defaults to util.file_readers.DEFAULT_WARMUP_FRACTION.
         '''
         latency_filename = kwargs.get('latency_filename',None)
         output_filename = kwargs.get('output_filename',None)
-        
-        latency_list = read_latencies(latency_filename)
-        with open(output_filename,'w') as fd:
-            fd.write('1,') # running on one switch
-            fd.write(other.num_list_to_string(latency_list) + '\n')
+
+        if output_filename is None:
+            assert False
+
+        other.write_rows(
+            output_filename,ReadOnlyProcessor.iter_rows(**kwargs),
+            kwargs.get('output_format','text'),
+            kwargs.get('output_stats_filename',None))
+
+    @staticmethod
+    def produce(**kwargs):
+        '''
+        Same as run, except does not need, or write to,
+        output_filename.
+
+        @returns {list} --- The single row that run writes to
+        output_filename, as a (a,b) tuple: a is the number of switches
+        (1), b is an array of op latencies, in ns.
+        '''
+        return list(ReadOnlyProcessor.iter_rows(**kwargs))
+
+    @staticmethod
+    def iter_rows(**kwargs):
+        '''
+        @returns {generator} --- Yields the rows of produce one at a
+        time, so that only a single row needs to be in memory.
+        '''
+        latency_filename = kwargs.get('latency_filename',None)
+        latency_series = read_latencies(
+            latency_filename,
+            kwargs.get('warmup_fraction',DEFAULT_WARMUP_FRACTION))
+        # running on one switch
+        yield (1,latency_series.array)
 
 @register_processor
 class LatencyContentionProcessor(object):
@@ -154,25 +284,74 @@ class LatencyContentionProcessor(object):
         where the first number of a line is the number of switches in the
         experiment and the subsequent numbers in the line represent the
         time, in ns, that an op took.
+
+        @param {String} output_format --- Optional.  'text' (default)
+        for the format above, or 'binary' for the equivalent, much
+        smaller, util.row_file format.
+
+        @param {int} num_workers --- Optional.  Maximum number of input
+        files to parse at once, each in its own process.  Defaults to
+        the number of cpus.  Workers only write each file's trace
+        cache (@see util.file_readers.cache_trace), so files are still
+        read, and rows held in memory, one at a time.
+
+        @param {String} output_stats_filename --- Optional.  If set,
+        also save the statistics needed to draw a box and whisker plot
+        of each line's latencies to this file, in the same format
+        (@see util.other.write_rows).
+
+        @param {float or String} warmup_fraction --- Optional.  Fraction
+        of each trace to drop as warmup, or 'auto' to choose each
+        switch's cut from its own data (@see util.steady_state).
+        Defaults to util.file_readers.DEFAULT_WARMUP_FRACTION.
         '''
         output_filename = kwargs.get('output_filename',None)
         input_tuple_list = kwargs.get('input_tuple_list',None)
 
         if ((input_tuple_list is None) or (output_filename is None)):
             assert False
-            
-        output_string = ''
-        for filename_num_switches_tuple in input_tuple_list:
-            num_switches = filename_num_switches_tuple['num_switches']
-            latency_input_filename = filename_num_switches_tuple['filename']
-            latency_list = read_latencies(latency_input_filename)
 
-            output_string += str(num_switches) + ','
-            # add string list to output string
-            output_string += other.num_list_to_string(latency_list) + '\n'
+        other.write_rows(
+            output_filename,LatencyContentionProcessor.iter_rows(**kwargs),
+            kwargs.get('output_format','text'),
+            kwargs.get('output_stats_filename',None))
+
+    @staticmethod
+    def produce(**kwargs):
+        '''
+        Same as run, except does not need, or write to,
+        output_filename.
+
+        @returns {list} --- The rows that run writes to
+        output_filename.  Each element is a (a,b) tuple: a is the
+        number of switches, b is an array of op latencies, in ns.
+        '''
+        return list(LatencyContentionProcessor.iter_rows(**kwargs))
+
+    @staticmethod
+    def iter_rows(**kwargs):
+        '''
+        @returns {generator} --- Yields the rows of produce one at a
+        time, so that only a single row needs to be in memory.
+        '''
+        input_tuple_list = kwargs.get('input_tuple_list',None)
+        if input_tuple_list is None:
+            assert False
 
-        with open(output_filename,'w') as fd:
-            fd.write(output_string)
+        # input files are parsed into their trace caches in parallel;
+        # only then is each one read, here, one at a time.
+        cached_iter = imap_ordered(
+            cache_trace,
+            [(filename_num_switches_tuple['filename'],)
+             for filename_num_switches_tuple in input_tuple_list],
+            kwargs.get('num_workers',None))
+        for filename_num_switches_tuple, cached in itertools.izip(
+            input_tuple_list,cached_iter):
+            latency_series = read_latencies(
+                filename_num_switches_tuple['filename'],
+                kwargs.get('warmup_fraction',DEFAULT_WARMUP_FRACTION))
+            num_switches = filename_num_switches_tuple['num_switches']
+            yield (num_switches,latency_series.array)
 
 @register_processor
 class LatencyRTTProcessor(object):
@@ -198,6 +377,26 @@ class LatencyRTTProcessor(object):
         latency added between the switches and the controller, in ns, and
         subsequent numbers in the line represent the time, in ns, that an
         op took.
+
+        @param {String} output_format --- Optional.  'text' (default)
+        for the format above, or 'binary' for the equivalent, much
+        smaller, util.row_file format.
+
+        @param {int} num_workers --- Optional.  Maximum number of input
+        files to parse at once, each in its own process.  Defaults to
+        the number of cpus.  Workers only write each file's trace
+        cache (@see util.file_readers.cache_trace), so files are still
+        read, and rows held in memory, one at a time.
+
+        @param {String} output_stats_filename --- Optional.  If set,
+        also save the statistics needed to draw a box and whisker plot
+        of each line's latencies to this file, in the same format
+        (@see util.other.write_rows).
+
+        @param {float or String} warmup_fraction --- Optional.  Fraction
+        of each trace to drop as warmup, or 'auto' to choose each
+        switch's cut from its own data (@see util.steady_state).
+        Defaults to util.file_readers.DEFAULT_WARMUP_FRACTION.
         '''
         output_filename = kwargs.get('output_filename',None)
         input_tuple_list = kwargs.get('input_tuple_list',None)
@@ -205,16 +404,45 @@ class LatencyRTTProcessor(object):
         if ((input_tuple_list is None) or (output_filename is None)):
             assert False
 
-        output_string = ''
-        for filename_delay_us_tuple in input_tuple_list:
-            delay_us = filename_delay_us_tuple['delay_us']
-            latency_input_filename = filename_delay_us_tuple['filename']
+        other.write_rows(
+            output_filename,LatencyRTTProcessor.iter_rows(**kwargs),
+            kwargs.get('output_format','text'),
+            kwargs.get('output_stats_filename',None))
 
-            latency_list = read_latencies(latency_input_filename)
-            output_string += str(other.us_to_ns(delay_us)) + ','
-            # add string list to output string
-            output_string += other.num_list_to_string(latency_list) + '\n'
+    @staticmethod
+    def produce(**kwargs):
+        '''
+        Same as run, except does not need, or write to,
+        output_filename.
 
-        with open(output_filename,'w') as fd:
-            fd.write(output_string)
+        @returns {list} --- The rows that run writes to
+        output_filename.  Each element is a (a,b) tuple: a is the
+        artificial latency, in ns, b is an array of op latencies, in
+        ns.
+        '''
+        return list(LatencyRTTProcessor.iter_rows(**kwargs))
 
+    @staticmethod
+    def iter_rows(**kwargs):
+        '''
+        @returns {generator} --- Yields the rows of produce one at a
+        time, so that only a single row needs to be in memory.
+        '''
+        input_tuple_list = kwargs.get('input_tuple_list',None)
+        if input_tuple_list is None:
+            assert False
+
+        # input files are parsed into their trace caches in parallel;
+        # only then is each one read, here, one at a time.
+        cached_iter = imap_ordered(
+            cache_trace,
+            [(filename_delay_us_tuple['filename'],)
+             for filename_delay_us_tuple in input_tuple_list],
+            kwargs.get('num_workers',None))
+        for filename_delay_us_tuple, cached in itertools.izip(
+            input_tuple_list,cached_iter):
+            latency_series = read_latencies(
+                filename_delay_us_tuple['filename'],
+                kwargs.get('warmup_fraction',DEFAULT_WARMUP_FRACTION))
+            delay_us = filename_delay_us_tuple['delay_us']
+            yield (other.us_to_ns(delay_us),latency_series.array)
@@ -0,0 +1,55 @@
+import contextlib
+import os
+import tempfile
+
+import instrumentation
+
+'''
+Output files only appear once they are complete.  Data gets written
+to a temporary file next to the output file, which is renamed over
+the output file at the end.  If writing fails, the old output file (if
+any) is left untouched and the temporary file is removed.
+'''
+
+@contextlib.contextmanager
+def atomic_output_filename(output_filename):
+    '''
+    @param {String} output_filename --- Name of file to produce.
+
+    @returns {context manager} --- Yields the name of a temporary file
+    in the same directory, with the same extension, as
+    output_filename.  The temporary file replaces output_filename
+    when the with block exits without an exception.
+    '''
+    output_filename = os.path.abspath(output_filename)
+    fd, tmp_filename = tempfile.mkstemp(
+        dir=os.path.dirname(output_filename),
+        prefix='.' + os.path.basename(output_filename) + '.',
+        suffix=os.path.splitext(output_filename)[1])
+    os.close(fd)
+    try:
+        yield tmp_filename
+        # mkstemp only makes the file readable by its owner; use the
+        # same permissions open() would have.
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_filename,0o666 & ~umask)
+        instrumentation.count(
+            instrumentation.BYTES_WRITTEN,os.path.getsize(tmp_filename))
+        os.rename(tmp_filename,output_filename)
+    except:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+        raise
+
+@contextlib.contextmanager
+def atomic_open(output_filename,mode='w'):
+    '''
+    Use in place of open(output_filename,mode) for writing output
+    files.
+
+    @returns {context manager} --- Yields a file object.
+    '''
+    with atomic_output_filename(output_filename) as tmp_filename:
+        with open(tmp_filename,mode) as fd:
+            yield fd
@@ -1,10 +1,28 @@
-import other
+import fractions
+import math
+import string
+
+import numpy
+
+import compressed
+import instrumentation
+import steady_state
+from steady_state import AUTO_WARMUP
+import trace_cache
+from latency_series import LatencySeries
+from throughput_series import ThroughputSeries
 
 # Java's jit compiler makes code go faster and faster as it runs.  To
 # avoid the effects of this, filter out this fraction of traces from
-# data and use rest.
+# data and use rest.  Readers also take AUTO_WARMUP, to choose each
+# switch's cut from its own data instead (@see util.steady_state).
 DEFAULT_WARMUP_FRACTION = .5
 
+# Raw traces are parsed in blocks of this many bytes.  A single
+# switch's line can be larger than memory, so never read a whole line
+# at once.
+BLOCK_SIZE_BYTES = 1 << 24
+
 # For throughput, divide traces into .5 second bins.  Calculate the
 # throughput across that bin.
 SAMPLE_LENGTH_SECONDS = .5
@@ -21,43 +39,45 @@ def read_throughputs_produce_latencies(
     Each number is the time (in ns) at which an operation committed.
     Take deltas between successive numbers to generate latencies.
     
-    @returns {list} --- A list of ints, each representing the number
-    of nanoseconds an operation took.
+    @returns {LatencySeries} --- Each element is an int64,
+    representing the number of nanoseconds an operation took.
     '''
-    # single_file_data is a list containing separate lists.  Each list
-    # contains timestamps from a single application's operations.
+    # single_file_data is a list containing separate arrays.  Each
+    # array contains timestamps from a single application's operations.
     single_file_data = _read_single_file_data(filename)
-    
-    # first take deltas to produce latencies
-    latency_data = []
-    for single_application_data in single_file_data:
-        single_latency_app_data = []
-        latency_data.append(single_latency_app_data)
-        for i in range(1,len(single_application_data)):
-            prev = single_application_data[i-1]
-            current = single_application_data[i]
-
-            latency = current-prev
-            # sanity check
-            if latency < 0:
-                print '\nShould never get negative latencies\n'
-                assert False
-            
-            single_latency_app_data.append(latency)
-
-    # now filter out warmup
-    warmed_up_latency_data = []
-    for single_latency_data in latency_data:
-        single_warmed_up_latency = (
-            single_latency_data[int(len(single_latency_data)*warmup_fraction):],
-            single_latency_data)
-        warmed_up_latency_data.append(single_warmed_up_latency)
-
-    # now collapse all lists into one
-    to_return = []
-    for single_warmed_up_latency in warmed_up_latency_data:
-        to_return += single_warmed_up_latency
-    return to_return
+
+    # n timestamps produce n-1 deltas; the first warmup_fraction of
+    # deltas get filtered out.
+    if warmup_fraction == AUTO_WARMUP:
+        warmup_cut_list = _auto_timestamp_cuts(filename,single_file_data)
+    else:
+        warmup_cut_list = []
+        for single_application_data in single_file_data:
+            num_deltas = max(len(single_application_data) - 1,0)
+            warmup_cut_list.append(int(num_deltas*warmup_fraction))
+
+    latency_series = LatencySeries([
+        max(len(single_application_data) - 1 - warmup_cut,0)
+        for single_application_data, warmup_cut
+        in zip(single_file_data,warmup_cut_list)])
+
+    # take deltas straight into the preallocated series
+    for i, single_application_data in enumerate(single_file_data):
+        single_latency_app_data = latency_series.switch_latencies(i)
+        if len(single_latency_app_data) == 0:
+            continue
+        warmup_cut = warmup_cut_list[i]
+        numpy.subtract(
+            single_application_data[warmup_cut+1:],
+            single_application_data[warmup_cut:-1],
+            out=single_latency_app_data)
+
+    # sanity check
+    if (latency_series.array < 0).any():
+        print '\nShould never get negative latencies\n'
+        assert False
+
+    return latency_series
 
 
 def read_throughputs(filename,warmup_fraction=DEFAULT_WARMUP_FRACTION):
@@ -65,57 +85,115 @@ def read_throughputs(filename,warmup_fraction=DEFAULT_WARMUP_FRACTION):
     @returns {list} --- A list of floats, each representing number of
     ops/s
     '''
-    # single_file_data is a list containing separate lists.  Each
-    # list contains timestamps from a single switch's operations.
+    # single_file_data is a list containing separate arrays.  Each
+    # array contains timestamps from a single switch's operations.
     single_file_data = _read_single_file_data(filename)
-    return _find_throughput(single_file_data)
+    warmup_fraction = _window_warmup_fraction(
+        filename,single_file_data,warmup_fraction)
+    return _find_throughput(
+        single_file_data,warmup_fraction=warmup_fraction)
+
+def read_throughput_series(filename,sample_length_seconds_list,
+                           warmup_fraction=DEFAULT_WARMUP_FRACTION):
+    '''
+    @param {String} filename --- Raw trace file.  @see read_latencies
+    for format.
+
+    @param {list} sample_length_seconds_list --- Each element is a
+    float, a bin length to compute throughput over.  Eg., [.01, .1,
+    .5, 1].
+
+    @returns {dict} --- Keys are the elements of
+    sample_length_seconds_list; values are ThroughputSeries objects.
+    All are computed from a single read of filename.
+    '''
+    single_file_data = _read_single_file_data(filename)
+    warmup_fraction = _window_warmup_fraction(
+        filename,single_file_data,warmup_fraction)
+    return _find_throughput_series(
+        single_file_data,sample_length_seconds_list,warmup_fraction)
 
 def _find_throughput(times,sample_length_seconds=SAMPLE_LENGTH_SECONDS,
                      warmup_fraction=DEFAULT_WARMUP_FRACTION):
     '''
-    @param {list of lists} times --- A list of lists.  Each internal
-    list contains a timestamp for when an operation completed.
+    @param {list} times --- A list of int64 arrays.  Each array
+    contains a timestamp for when an operation completed.
 
     @returns {list} --- A list of floats, each representing number of
-    ops/s
+    ops/s.  Buckets that no op fell into are not reported.
+    '''
+    throughput_series = _find_throughput_series(
+        times,[sample_length_seconds],warmup_fraction)[sample_length_seconds]
+    return throughputs_from_series(throughput_series)
+
+def throughputs_from_series(throughput_series):
+    '''
+    @param {ThroughputSeries} throughput_series
+
+    @returns {list} --- @see read_throughputs.  The aggregate
+    throughput of each of throughput_series's bins, skipping bins
+    that no op fell into.
+    '''
+    throughput_ops_per_second = throughput_series.ops_per_second()
+    return throughput_ops_per_second[throughput_ops_per_second != 0].tolist()
+
+def _find_throughput_series(times,sample_length_seconds_list,
+                            warmup_fraction=DEFAULT_WARMUP_FRACTION):
+    '''
+    @param {list} times --- A list of int64 arrays.  Each array
+    contains a timestamp for when an operation completed.
+
+    @param {list} sample_length_seconds_list --- @see
+    read_throughput_series
+
+    @returns {dict} --- @see read_throughput_series
     '''
     start, end = _find_window(times, warmup_fraction)
+    # timestamps are integers, so t >= start iff t >= ceil(start)
+    start = int(math.ceil(start))
 
     # trimmed is all entries in times that was between start and end.
-    trimmed = [ [ t for t in arr if t >= start and t <= end ] for arr in times ]
-
-    num_switches = len(trimmed)
-    all_trimmed_data = []
-    for switch_data_list in trimmed:
-        all_trimmed_data += switch_data_list
-
-    # should contain ns timestamps of all generated data
-    sorted_data = sorted(all_trimmed_data)
-
-    # normalize so that beginning of data start at 0
-    earliest_data = sorted_data[0]
-    sorted_data = map(
-        lambda d : d - earliest_data,
-        sorted_data)
-    data_in_s = map(
-        lambda d : other.ns_to_s(d),
-        sorted_data)
-
-    bucket_count_dict = {}
-    for datum in data_in_s:
-        time_bucket = int (datum / sample_length_seconds)
-        current_count = bucket_count_dict.setdefault(time_bucket,0)
-        bucket_count_dict[time_bucket] = current_count + 1
-    
-    # get rid of last element, in case it didn't run an integer
-    # divisible amount of time.
-    del bucket_count_dict[time_bucket]
-    counts_per_period = bucket_count_dict.values()
-    throughput_ops_per_second = map(
-        lambda count : count / sample_length_seconds,
-        counts_per_period)
-    
-    return throughput_ops_per_second
+    # Each switch's timestamps are in ascending order, so the window
+    # is a contiguous slice that can be found with a binary search.
+    trimmed = [
+        arr[numpy.searchsorted(arr,start,'left'):
+            numpy.searchsorted(arr,end,'right')]
+        for arr in times ]
+
+    # normalize so that beginning of data starts at 0.
+    earliest_data = min([arr[0] for arr in trimmed if len(arr) != 0])
+    latest_data = max([arr[-1] for arr in trimmed if len(arr) != 0])
+
+    # Count at the finest bin length that evenly divides every
+    # requested sample length; coarser series are sums of these.
+    sample_length_ns_list = [
+        int(round(sample_length_seconds * 1000000000))
+        for sample_length_seconds in sample_length_seconds_list]
+    base_length_ns = reduce(fractions.gcd,sample_length_ns_list)
+
+    # bin_edges[i] is the first timestamp that falls into bin i.
+    # Counting each switch's timestamps below every edge is a binary
+    # search per edge and needs no global sort of all switches' data.
+    num_bins = (latest_data - earliest_data) // base_length_ns + 1
+    bin_edges = (
+        earliest_data +
+        numpy.arange(num_bins + 1,dtype=numpy.int64) * base_length_ns)
+    base_counts = numpy.empty((len(trimmed),num_bins),dtype=numpy.int64)
+    for i, arr in enumerate(trimmed):
+        base_counts[i] = numpy.diff(numpy.searchsorted(arr,bin_edges,'left'))
+
+    to_return = {}
+    for sample_length_seconds, sample_length_ns in zip(
+        sample_length_seconds_list,sample_length_ns_list):
+        bins_per_sample = sample_length_ns // base_length_ns
+        # get rid of last bucket, in case it didn't run an integer
+        # divisible amount of time.
+        num_samples = (latest_data - earliest_data) // sample_length_ns
+        switch_counts = base_counts[:,:num_samples*bins_per_sample].reshape(
+            len(trimmed),num_samples,bins_per_sample).sum(axis=2)
+        to_return[sample_length_seconds] = ThroughputSeries(
+            sample_length_seconds,switch_counts)
+    return to_return
 
 def _find_window(times, warmup_fraction):
     """Finds the window of data we want to use.
@@ -145,53 +223,209 @@ def read_latencies(filename,warmup_fraction=DEFAULT_WARMUP_FRACTION):
     Ie., each line contains comma-separated numbers.  The numbers are
     in nanoseconds.
 
-    @param {float} warmup_fraction --- 0 to 1.  What fraction of
-    values we should truncate to account for warmup.
+    @param {float or String} warmup_fraction --- 0 to 1.  What
+    fraction of values we should truncate to account for warmup.  Or
+    AUTO_WARMUP, to truncate each switch's values up to where its
+    latencies reach steady state.
 
-    @returns {list} --- Each element is an integer, providing the
-    nanosecond timestamp of the number.
+    @returns {LatencySeries} --- Each element is an int64, providing
+    the nanosecond timestamp of the number.
     '''
     
-    list_of_list_of_timestamps = _read_single_file_data(filename)
-    ### perform warmup truncation
-    list_of_list_of_timestamps = map(
-        lambda internal_list:
-            internal_list[ int(len(internal_list)*warmup_fraction):],
-        list_of_list_of_timestamps)
-    
-    ### reduce list of lists to a single list
-    latencies_list = reduce(
-        lambda cumulative_list, element_list : cumulative_list + element_list,
-        list_of_list_of_timestamps,[])
+    list_of_timestamp_arrays = _read_single_file_data(filename)
+    if warmup_fraction == AUTO_WARMUP:
+        warmup_cut_list = _auto_timestamp_cuts(
+            filename,list_of_timestamp_arrays)
+    else:
+        warmup_cut_list = [
+            int(len(timestamp_array)*warmup_fraction)
+            for timestamp_array in list_of_timestamp_arrays]
+    ### perform warmup truncation.  Slicing does not copy.
+    list_of_timestamp_arrays = [
+        timestamp_array[warmup_cut:]
+        for timestamp_array, warmup_cut
+        in zip(list_of_timestamp_arrays,warmup_cut_list)]
+
+    ### copy each switch's data into a single preallocated array
+    latency_series = LatencySeries(
+        [len(timestamp_array) for timestamp_array in list_of_timestamp_arrays])
+    for i, timestamp_array in enumerate(list_of_timestamp_arrays):
+        latency_series.switch_latencies(i)[:] = timestamp_array
+    return latency_series
+
 
-    return latencies_list
+def _auto_timestamp_cuts(filename,times):
+    '''
+    @param {list} times --- Each element is an int64 array of a single
+    switch's timestamps, read from filename.
+
+    @returns {list} --- Number of leading timestamps of each switch to
+    drop as warmup (@see util.steady_state.timestamp_cut).  The cuts
+    are also reported.
+    '''
+    warmup_cut_list = [
+        steady_state.timestamp_cut(timestamp_array)
+        for timestamp_array in times]
+    steady_state.report_timestamp_cuts(
+        filename,warmup_cut_list,[len(arr) for arr in times])
+    return warmup_cut_list
+
+
+def _window_warmup_fraction(filename,times,warmup_fraction):
+    '''
+    @param {float or String} warmup_fraction --- @see read_latencies
+
+    @returns {float} --- warmup_fraction, if it is a number.  For
+    AUTO_WARMUP, the fraction of the time every switch was running
+    (@see _find_window) that passed before all their throughputs
+    reached steady state.  The cut is also reported.
+    '''
+    if warmup_fraction != AUTO_WARMUP:
+        return warmup_fraction
+
+    start, cut_ns_list = steady_state.window_start(times)
+    last_start = max([arr[0] for arr in times])
+    window_length_ns = min([arr[-1] for arr in times]) - last_start
+    steady_state.report_window_cuts(filename,cut_ns_list,window_length_ns)
+    if window_length_ns <= 0:
+        return 0.
+    return float(start - last_start) / window_length_ns
 
 
+@instrumentation.in_phase(instrumentation.PARSE_PHASE)
 def _read_single_file_data(filename):
     '''
-    @returns {list} --- Each list contains a list of numbers.  The
+    Reads from filename's binary sidecar if it is up to date, and
+    streams filename into a fresh sidecar otherwise.  @see
+    util.trace_cache.  Arrays are memory-mapped from the sidecar, so
+    computations over them only page in the data they touch.
+
+    @returns {list} --- Each element is an int64 numpy array.  The
     numbers are nanosecond timestamps for each operation that a switch
     performs.
     '''
-    to_return = []
-    fd = open(filename,'r')
-    for switch_line in fd:
-        to_return.append(_read_switch_line(switch_line))
-    fd.close()
-    return to_return
+    to_return = trace_cache.load(filename)
+    if to_return is not None:
+        return to_return
+
+    if trace_cache.store(filename,iter_switch_chunks(filename)):
+        to_return = trace_cache.load(filename)
+        if to_return is not None:
+            return to_return
+
+    # could not write a sidecar: keep parsed data in memory instead.
+    chunk_lists = []
+    for switch_index, chunk in iter_switch_chunks(filename):
+        while len(chunk_lists) <= switch_index:
+            chunk_lists.append([])
+        chunk_lists[switch_index].append(chunk)
+    return [_concatenate(chunk_list) for chunk_list in chunk_lists]
+
+
+@instrumentation.in_phase(instrumentation.PARSE_PHASE)
+def cache_trace(filename):
+    '''
+    Parses filename into its binary sidecar (@see util.trace_cache),
+    unless the sidecar is already up to date.  Lets a worker process
+    do the parsing for a reader in another process, without sending
+    it any parsed data: the reader then memory-maps the sidecar.
+
+    @param {String} filename --- Name of raw trace file.
+
+    @returns {bool} --- True if filename's sidecar is up to date.  If
+    False (eg., the trace sits in a read-only directory), readers
+    parse filename again themselves.
+    '''
+    if trace_cache.is_up_to_date(filename):
+        return True
+    return trace_cache.store(filename,iter_switch_chunks(filename))
+
+
+def iter_switch_chunks(filename,block_size=BLOCK_SIZE_BYTES):
+    '''
+    Streams a raw trace file without ever holding a full line in
+    memory.
+
+    @param {String} filename --- Name of raw trace file.  Each line
+    contains a single switch's comma-separated ns timestamps.
+
+    @param {int} block_size --- Number of bytes to read at a time.
+
+    @returns {generator} --- Yields (a,b) tuples, in file order.  a is
+    the index of the switch (line) that the timestamps belong to; b is
+    an int64 array of consecutive timestamps from that switch.  Every
+    switch yields at least one (possibly empty) chunk.
+    '''
+    switch_index = 0
+    # true if we have yielded part of switch_index's line already
+    line_open = False
+    # the trailing part of the last block that may be the beginning
+    # of a number split across blocks.
+    carry = ''
+    with compressed.open_input(filename) as fd:
+        while True:
+            block = fd.read(block_size)
+            if block == '':
+                break
+            instrumentation.count(instrumentation.BYTES_READ,len(block))
+
+            line_list = (carry + block).split('\n')
+            partial_line = line_list.pop()
+            for line in line_list:
+                yield switch_index, _read_switch_line(line)
+                switch_index += 1
+                line_open = False
+
+            # only parse up to the last comma; anything after it could
+            # be cut off by the end of the block.
+            cut = partial_line.rfind(',') + 1
+            carry = partial_line[cut:]
+            if cut != 0:
+                yield switch_index, _read_switch_line(partial_line[:cut])
+                line_open = True
+
+    # last line did not end with a newline
+    if line_open or (carry != ''):
+        yield switch_index, _read_switch_line(carry)
+
 
 def _read_switch_line(single_switch_data_string):
     '''
     @param {string} single_switch_data_string ---- comma-separated
     string containing numbers.
     
-    @returns {list} --- Each element is an integer.
-    '''
-    entries = single_switch_data_string.split(',')
-    # remove whitespace
-    entries = filter(
-        lambda entry: entry.strip() != '',
-        entries)
-    return map(
-        lambda x: int(x),
-        entries)
+    @returns {numpy.ndarray} --- Each element is an int64.  Empty
+    entries are skipped.  Raises ValueError if an entry is not an
+    integer.
+    '''
+    # numpy skips whitespace around each number itself, but stops
+    # parsing at a trailing comma; remove leading and trailing commas,
+    # and any blank entries among them, first.
+    stripped = single_switch_data_string.strip(string.whitespace + ',')
+    if stripped == '':
+        return numpy.empty(0,dtype=numpy.int64)
+    to_return = numpy.fromstring(stripped,dtype=numpy.int64,sep=',')
+    # numpy reads a whitespace-only entry as 0, and stops, silently, at
+    # the first empty or malformed entry, ignoring anything after the
+    # last number it parses.  No real timestamp is 0: parse entry by
+    # entry if any of those could have happened.
+    if ((len(to_return) != stripped.count(',') + 1) or
+            (int(stripped[stripped.rfind(',') + 1:]) != to_return[-1]) or
+            (to_return == 0).any()):
+        to_return = numpy.array(
+            [int(entry) for entry in stripped.split(',')
+             if entry.strip() != ''],
+            dtype=numpy.int64)
+    instrumentation.count(instrumentation.TIMESTAMPS_PARSED,len(to_return))
+    return to_return
+
+def _concatenate(array_list):
+    '''
+    @param {list} array_list --- Each element is a numpy array.
+
+    @returns {numpy.ndarray} --- A single int64 array containing the
+    elements of every array in array_list, in order.
+    '''
+    if len(array_list) == 0:
+        return numpy.empty(0,dtype=numpy.int64)
+    return numpy.concatenate(array_list)
@@ -0,0 +1,346 @@
+import contextlib
+import cProfile
+import functools
+import os
+import resource
+import time
+
+'''
+Opt-in measurements of processor jobs (@see generate.py --report and
+--profile-dir).
+
+While a job is being recorded, readers, writers and plotters report
+to it how many bytes they read and write, how many numbers they
+parse, and how long they spend in each phase.  Time spent in a phase
+nested in another (eg., parsing rows as they are written) only counts
+towards the innermost one; time outside every phase counts as
+COMPUTE_PHASE.  When no job is being recorded, which is the default,
+every call here returns at once.
+
+Calls run in worker processes (@see util.parallel) are recorded in
+the worker, and what they were told gets added to the job once their
+results are back.  Their phases ran alongside the job's own, so with
+several workers, phases can add up to more than the job's wall time.
+
+Peak memory is the resident set size high-water mark of the process
+(python 2 has no tracemalloc).  Jobs that share a process (--jobs 1)
+share a high-water mark, so each job also records how much it raised
+it.
+'''
+
+IMPORT_PHASE = 'import'
+PARSE_PHASE = 'parse'
+WRITE_PHASE = 'write'
+PLOT_PHASE = 'plot'
+COMPUTE_PHASE = 'compute'
+
+# names of the counts that each job record keeps
+BYTES_READ = 'bytes_read'
+BYTES_WRITTEN = 'bytes_written'
+# timestamps parsed from raw latency and fairness traces
+TIMESTAMPS_PARSED = 'timestamps_parsed'
+# latencies, throughputs and statistics parsed from text rows
+VALUES_PARSED = 'values_parsed'
+COUNT_NAME_LIST = [BYTES_READ,BYTES_WRITTEN,TIMESTAMPS_PARSED,VALUES_PARSED]
+
+
+class _State(object):
+    def __init__(self):
+        # JobRecord of the job being run, or None when not recording
+        self.job_record = None
+
+_state = _State()
+
+
+class JobRecord(object):
+    def __init__(self,index,name):
+        '''
+        @param {int} index --- Index of the job in the config file.
+
+        @param {String} name --- Name of the job's processor.
+        '''
+        self.index = index
+        self.name = name
+        self.succeeded = False
+        self.count_dict = dict(
+            (count_name,0) for count_name in COUNT_NAME_LIST)
+        self.phase_seconds_dict = {}
+        # phases of calls run in worker processes
+        self.worker_phase_seconds_dict = {}
+        # each value is a list of entries, @see add_detail
+        self.detail_dict = {}
+        # each element is a [phase name, time phase last resumed] list
+        self._phase_stack = []
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.peak_rss_kb = None
+        self.rss_growth_kb = None
+
+    def add_phase_seconds(self,phase_name,seconds):
+        self.phase_seconds_dict[phase_name] = (
+            self.phase_seconds_dict.get(phase_name,0.) + seconds)
+
+    def enter_phase(self,phase_name):
+        now = time.time()
+        if len(self._phase_stack) != 0:
+            # pause the enclosing phase
+            outer_phase = self._phase_stack[-1]
+            self.add_phase_seconds(outer_phase[0],now - outer_phase[1])
+        self._phase_stack.append([phase_name,now])
+
+    def exit_phase(self):
+        now = time.time()
+        phase_name, resume_time = self._phase_stack.pop()
+        self.add_phase_seconds(phase_name,now - resume_time)
+        if len(self._phase_stack) != 0:
+            self._phase_stack[-1][1] = now
+
+    def worker_summary(self):
+        '''
+        @returns {dict} --- What the call recorded by this JobRecord
+        was told, in a form that can be sent back from a worker
+        process.  @see merge_worker_summary.
+        '''
+        return {
+            'count_dict': self.count_dict,
+            'phase_seconds_dict': self.phase_seconds_dict,
+            'detail_dict': self.detail_dict,
+            }
+
+    def to_dict(self):
+        '''
+        @returns {dict} --- Everything recorded about the job, in a
+        form that json can save.
+        '''
+        phase_seconds_dict = dict(self.phase_seconds_dict)
+        phase_seconds_dict[COMPUTE_PHASE] = max(
+            self.wall_seconds - sum(phase_seconds_dict.values()),0.)
+        for phase_name, seconds in self.worker_phase_seconds_dict.items():
+            phase_seconds_dict[phase_name] = (
+                phase_seconds_dict.get(phase_name,0.) + seconds)
+        to_return = {
+            'index': self.index,
+            'name': self.name,
+            'succeeded': self.succeeded,
+            'wall_seconds': self.wall_seconds,
+            'cpu_seconds': self.cpu_seconds,
+            'peak_rss_kb': self.peak_rss_kb,
+            'rss_growth_kb': self.rss_growth_kb,
+            'phase_seconds': phase_seconds_dict,
+            }
+        to_return.update(self.count_dict)
+        to_return.update(self.detail_dict)
+        return to_return
+
+
+@contextlib.contextmanager
+def record_job(index,name,profile_filename=None):
+    '''
+    Records the job run in the with block.
+
+    @param {int} index --- @see JobRecord
+
+    @param {String} name --- @see JobRecord
+
+    @param {String or None} profile_filename --- If not None, also
+    profile the with block and save its cProfile stats to this file.
+
+    @returns {context manager} --- Yields a JobRecord, which is
+    complete once the with block exits.  succeeded is True if the
+    with block exited without an exception.
+    '''
+    job_record = JobRecord(index,name)
+    profiler = None
+    if profile_filename is not None:
+        profiler = cProfile.Profile()
+
+    outer_job_record = _state.job_record
+    _state.job_record = job_record
+    start_usage = _cpu_seconds()
+    start_max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    try:
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield job_record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+        job_record.succeeded = True
+    finally:
+        job_record.wall_seconds = time.time() - start
+        job_record.cpu_seconds = _cpu_seconds() - start_usage
+        # kilobytes on linux
+        job_record.peak_rss_kb = resource.getrusage(
+            resource.RUSAGE_SELF).ru_maxrss
+        job_record.rss_growth_kb = job_record.peak_rss_kb - start_max_rss_kb
+        _state.job_record = outer_job_record
+        if profiler is not None:
+            profiler.dump_stats(profile_filename)
+
+
+def is_recording():
+    '''
+    @returns {bool} --- True if a job is being recorded.
+    '''
+    return _state.job_record is not None
+
+
+@contextlib.contextmanager
+def record_worker_call():
+    '''
+    Use in a worker process, around a call made for a job that is
+    being recorded in the parent process.  Workers are forked with a
+    copy of the parent's JobRecord, which the parent never sees.
+
+    @returns {context manager} --- Yields a fresh JobRecord that
+    everything in the with block gets recorded to, instead.  Send its
+    worker_summary() back to the parent.
+    '''
+    job_record = JobRecord(None,None)
+    outer_job_record = _state.job_record
+    _state.job_record = job_record
+    try:
+        yield job_record
+    finally:
+        _state.job_record = outer_job_record
+
+
+def merge_worker_summary(worker_summary):
+    '''
+    @param {dict} worker_summary --- @see JobRecord.worker_summary.
+    Its counts, phases and details get added to the job being
+    recorded.
+    '''
+    job_record = _state.job_record
+    if job_record is None:
+        return
+    for count_name, amount in worker_summary['count_dict'].items():
+        job_record.count_dict[count_name] += amount
+    for phase_name, seconds in (
+        worker_summary['phase_seconds_dict'].items()):
+        job_record.worker_phase_seconds_dict[phase_name] = (
+            job_record.worker_phase_seconds_dict.get(phase_name,0.) +
+            seconds)
+    for detail_name, entry_list in worker_summary['detail_dict'].items():
+        job_record.detail_dict.setdefault(detail_name,[]).extend(
+            entry_list)
+
+
+def _cpu_seconds():
+    '''
+    @returns {float} --- User plus system cpu time of this process and
+    of its finished child processes (eg., parallel parsers).
+    '''
+    total = 0.
+    for who in [resource.RUSAGE_SELF,resource.RUSAGE_CHILDREN]:
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+@contextlib.contextmanager
+def phase(phase_name):
+    '''
+    @param {String} phase_name --- Eg., PARSE_PHASE.  Time spent in
+    the with block counts towards this phase of the job being
+    recorded.
+    '''
+    job_record = _state.job_record
+    if job_record is None:
+        yield
+        return
+
+    job_record.enter_phase(phase_name)
+    try:
+        yield
+    finally:
+        job_record.exit_phase()
+
+
+def in_phase(phase_name):
+    '''
+    @returns {decorator} --- Makes time spent in the decorated
+    function count towards phase_name.  Do not use on generator
+    functions: only the time to create the generator would count.
+    '''
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args,**kwargs):
+            with phase(phase_name):
+                return function(*args,**kwargs)
+        return wrapper
+    return decorator
+
+
+def count(count_name,amount):
+    '''
+    @param {String} count_name --- An element of COUNT_NAME_LIST.
+
+    @param {int} amount --- Added to count_name of the job being
+    recorded.
+    '''
+    job_record = _state.job_record
+    if job_record is not None:
+        job_record.count_dict[count_name] += int(amount)
+
+
+def add_detail(detail_name,entry):
+    '''
+    @param {String} detail_name --- Key of the job's report to list
+    entry under.
+
+    @param {dict} entry --- Anything json can save, eg., a choice made
+    while running the job that should be auditable.
+    '''
+    job_record = _state.job_record
+    if job_record is not None:
+        job_record.detail_dict.setdefault(detail_name,[]).append(entry)
+
+
+def count_file_read(filename):
+    '''
+    Counts all of filename as read, eg., for memory-mapped files.
+    '''
+    if _state.job_record is not None:
+        count(BYTES_READ,os.path.getsize(filename))
+
+
+def share_state(other_instrumentation):
+    '''
+    @param {module} other_instrumentation --- Another copy of this
+    module (eg., the src tree's, loaded by util.pipeline).  Jobs
+    recorded through this module also get what other_instrumentation
+    is told.
+    '''
+    other_instrumentation._state = _state
+
+
+def profile_filename(profile_dir,index,name):
+    '''
+    @returns {String} --- Name of the file to save the cProfile stats
+    of job index, which runs processor name, to.
+    '''
+    return os.path.join(profile_dir,'job_%i_%s.prof' % (index,name))
+
+
+def keep_slowest_profiles(job_dict_list,profile_dir,num_to_keep):
+    '''
+    Removes the cProfile stats of all but the num_to_keep slowest
+    jobs.
+
+    @param {list} job_dict_list --- Each element is the to_dict() of a
+    JobRecord that was profiled into profile_dir.  The dicts of kept
+    jobs get a 'profile_filename' key, pointing at their stats.
+    '''
+    slowest_list = sorted(
+        job_dict_list,key=lambda job_dict: job_dict['wall_seconds'],
+        reverse=True)
+    for rank, job_dict in enumerate(slowest_list):
+        filename = profile_filename(
+            profile_dir,job_dict['index'],job_dict['name'])
+        if rank < num_to_keep:
+            job_dict['profile_filename'] = filename
+        elif os.path.exists(filename):
+            os.remove(filename)
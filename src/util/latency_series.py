@@ -0,0 +1,37 @@
+import numpy
+
+class LatencySeries(object):
+    '''
+    Latencies from every switch in a run, stored back to back in a
+    single contiguous int64 array.  Space for every switch is
+    allocated up front, so filling the series never copies data that
+    was already added.
+    '''
+    def __init__(self,switch_lengths):
+        '''
+        @param {list} switch_lengths --- Each element is an int, the
+        number of latencies that the corresponding switch contributes.
+        '''
+        self.offsets = numpy.zeros(len(switch_lengths) + 1,dtype=numpy.int64)
+        numpy.cumsum(switch_lengths,out=self.offsets[1:])
+        self.array = numpy.empty(self.offsets[-1],dtype=numpy.int64)
+
+    @property
+    def num_switches(self):
+        return len(self.offsets) - 1
+
+    def switch_latencies(self,switch_index):
+        '''
+        @param {int} switch_index --- Which switch to get latencies for.
+
+        @returns {numpy.ndarray} --- A writable view of the slice of
+        self.array that holds switch_index's latencies, in ns.
+        '''
+        return self.array[
+            self.offsets[switch_index]:self.offsets[switch_index+1]]
+
+    def __len__(self):
+        return len(self.array)
+
+    def __iter__(self):
+        return iter(self.array)
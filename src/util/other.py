@@ -1,3 +1,6 @@
+from row_writer import open_row_writer
+from box_stats import box_stats
+
 
 def ns_to_s(ns):
     return ns / 1000000000.
@@ -11,14 +14,72 @@ def us_to_ns(us):
     return us*1000
     
 
-def num_list_to_string(num_list):
+def write_rows(
+    output_filename,row_iter,output_format='text',
+    output_stats_filename=None):
     '''
-    @param {list} num_list --- Each element is an integer.
+    @param {String} output_filename --- Will save data to this file.
+    Format of saved data is:
+
+    #,#,#,#,#
+    #,#,#,#,#
+
+    where the first number of a line is the row key and the
+    subsequent numbers are the row's values.
+
+    @param {iterable} row_iter --- Each element is a (a,b) tuple.  a
+    is a row key, b is a list or array of numbers.  Rows get written
+    as they are produced, so row_iter can be a generator that only
+    holds one row at a time.
+
+    @param {String} output_format --- 'text' for the format above, or
+    'binary' for the equivalent util.row_file format.
+
+    @param {String or None} output_stats_filename --- If not None,
+    also save a row per row of output_filename to this file, in the
+    same format.  Each has the same key, followed by the statistics
+    needed to draw a box and whisker plot of the row's values (@see
+    util.box_stats.STAT_NAME_LIST).
+    '''
+    with open_row_writer(output_filename,output_format) as row_writer:
+        if output_stats_filename is None:
+            for row_key, row_values in row_iter:
+                row_writer.write_row(row_key,row_values)
+            return
+
+        with open_row_writer(
+            output_stats_filename,output_format) as stats_writer:
+            for row_key, row_values in row_iter:
+                row_writer.write_row(row_key,row_values)
+                stats_writer.write_row(row_key,box_stats(row_values))
+
+
+def write_throughput_series(row_writer,row_key,throughput_series,per_switch):
+    '''
+    @param {TextRowWriter} row_writer --- @see util.row_writer
+
+    @param {int} row_key --- First number of each line produced.
+
+    @param {ThroughputSeries} throughput_series --- Throughputs to
+    write.
+
+    @param {bool} per_switch --- If False, write a single line:
+
+    <row_key>,#,#,#,#
+
+    where each number is the combined throughput of all switches, in
+    ops/s, over a single bin.  If True, write one line per switch:
+
+    <row_key>,<switch index>,#,#,#,#
 
-    @returns {String} --- A comma-separated list of numbers.
+    where each number is that switch's throughput over a single bin.
+    Bins appear in time order.
     '''
-    # convert num list to string list
-    string_list = map(
-        lambda num : str(num), num_list)
-    return ','.join(string_list)
+    if not per_switch:
+        row_writer.write_row(row_key,throughput_series.ops_per_second())
+        return
 
+    switch_throughputs = throughput_series.switch_ops_per_second()
+    for switch_index in range(0,throughput_series.num_switches):
+        row_writer.write_row(
+            (row_key,switch_index),switch_throughputs[switch_index])
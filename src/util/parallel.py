@@ -0,0 +1,101 @@
+import multiprocessing
+import sys
+import traceback
+
+import instrumentation
+
+'''
+Runs independent pieces of a single processor job (eg., parsing each
+file of an input_tuple_list) in a pool of worker processes.
+
+Results get pickled back to the calling process, and finished results
+can pile up there waiting for earlier ones, so calls should return
+little (eg., util.file_readers.cache_trace leaves parsed data in a
+file for the caller to memory-map).  Python 2 cannot send a result
+of more than 2GB at all.
+'''
+
+def imap_ordered(function,argument_list,num_workers=None):
+    '''
+    @param {function} function --- Module-level function to call once
+    for each element of argument_list.
+
+    @param {list} argument_list --- Each element is a tuple of
+    positional arguments to call function with.
+
+    @param {int or None} num_workers --- Maximum number of calls to run
+    at once, each in its own process.  None means the number of cpus.
+
+    @returns {iterator} --- Yields the result of each call, in the
+    order of argument_list, as soon as it and all the calls before it
+    have finished.  Results that finish early are held until then.
+    If a job is being recorded (@see util.instrumentation), what each
+    worker's call reported gets added to it as its result is yielded.
+
+    Calls run one after another in the current process instead if
+    there is only one of them, if num_workers is 1, if the current
+    process is itself a pool worker (eg., generate.py --jobs), or if
+    function cannot be found by name in a worker (eg., src modules
+    loaded by figures' util.pipeline).
+    '''
+    if num_workers is None:
+        num_workers = multiprocessing.cpu_count()
+    num_workers = min(num_workers,len(argument_list))
+
+    if ((num_workers <= 1) or
+        multiprocessing.current_process().daemon or
+        (not _is_importable(function)) or
+        (not _is_importable(_call))):
+        return (function(*arguments) for arguments in argument_list)
+    return _imap_pool(function,argument_list,num_workers)
+
+
+def _imap_pool(function,argument_list,num_workers):
+    pool = multiprocessing.Pool(num_workers)
+    try:
+        record = instrumentation.is_recording()
+        call_list = [
+            (function,arguments,record) for arguments in argument_list]
+        for succeeded, result, worker_summary in pool.imap(
+            _call,call_list,chunksize=1):
+            if not succeeded:
+                raise RuntimeError(
+                    'Worker process failed:\n%s' % result)
+            if worker_summary is not None:
+                instrumentation.merge_worker_summary(worker_summary)
+            yield result
+    finally:
+        # also stops outstanding calls if the caller stops early
+        pool.terminate()
+        pool.join()
+
+
+def _call(function_arguments):
+    '''
+    Runs in a worker process.
+
+    @returns {3-tuple} (a,b,c) --- a is True if the call succeeded.
+    If it did, b is its result.  Otherwise, b is the traceback of the
+    failure, which would not survive being sent back as an exception.
+    c is what the call reported to util.instrumentation (@see
+    JobRecord.worker_summary), or None if the parent is not recording
+    a job.
+    '''
+    function, arguments, record = function_arguments
+    try:
+        if not record:
+            return (True,function(*arguments),None)
+        with instrumentation.record_worker_call() as worker_record:
+            result = function(*arguments)
+        return (True,result,worker_record.worker_summary())
+    except Exception:
+        return (False,traceback.format_exc(),None)
+
+
+def _is_importable(function):
+    '''
+    @returns {bool} --- True if function can be sent to a worker
+    process, which pickles functions by module and name.
+    '''
+    module = sys.modules.get(function.__module__,None)
+    return getattr(module,function.__name__,None) is function
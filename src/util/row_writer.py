@@ -0,0 +1,82 @@
+import contextlib
+
+import numpy
+
+from atomic_output import atomic_open
+import instrumentation
+from row_file import RowFileWriter
+
+'''
+Streams rows of intermediate data straight to output files.  Rows are
+formatted and written CHUNK_LENGTH values at a time, so memory use
+does not grow with the size of a row or of the output file.
+'''
+
+# Number of values to format at a time.
+CHUNK_LENGTH = 1 << 16
+
+
+class TextRowWriter(object):
+    def __init__(self,fd):
+        '''
+        @param {file} fd --- File object to write lines of the form
+
+        #,#,#,#,#
+
+        to.  The first number(s) of a line are the row's key, the rest
+        are its values.
+        '''
+        self.fd = fd
+
+    @instrumentation.in_phase(instrumentation.WRITE_PHASE)
+    def write_row(self,row_key,row_values):
+        '''
+        @param {int or tuple} row_key --- If a tuple, each element
+        gets written as a separate number at the start of the line.
+
+        @param {list or numpy.ndarray} row_values --- Numbers to
+        write.
+        '''
+        if isinstance(row_key,tuple):
+            self.fd.write(','.join([str(key) for key in row_key]) + ',')
+        else:
+            self.fd.write(str(row_key) + ',')
+
+        row_values = numpy.asarray(row_values)
+        for start in range(0,len(row_values),CHUNK_LENGTH):
+            if start != 0:
+                self.fd.write(',')
+            # numpy formats the whole chunk in one call
+            self.fd.write(
+                ','.join(row_values[start:start+CHUNK_LENGTH].astype(str)))
+        self.fd.write('\n')
+
+    def close(self):
+        pass
+
+
+@contextlib.contextmanager
+def open_row_writer(output_filename,output_format='text'):
+    '''
+    @param {String} output_filename --- File to write rows to.  Only
+    appears once every row has been written (@see util.atomic_output).
+
+    @param {String} output_format --- 'text' for #,#,#,... lines, or
+    'binary' for util.row_file format.
+
+    @returns {context manager} --- Yields an object with a
+    write_row(row_key,row_values) method.
+    '''
+    if output_format == 'binary':
+        with atomic_open(output_filename,'wb') as fd:
+            row_writer = RowFileWriter(fd)
+            yield row_writer
+            row_writer.close()
+    elif output_format == 'text':
+        with atomic_open(output_filename) as fd:
+            row_writer = TextRowWriter(fd)
+            yield row_writer
+            row_writer.close()
+    else:
+        print '\nUnknown output format %s\n' % output_format
+        assert False
@@ -0,0 +1,157 @@
+import numpy
+
+import instrumentation
+
+'''
+Chooses how much of the start of each switch's trace to drop as jit
+warmup, instead of a fixed fraction.
+
+Uses the marginal standard error rule (MSER): dropping the first d
+values of a series x_1, ..., x_n leaves a mean whose squared standard
+error is estimated by
+
+    sum over i > d of (x_i - mean of x_(d+1), ..., x_n)^2 / (n - d)^2
+
+The d that minimizes it trades the bias of keeping warmup values for
+the noise of keeping fewer values.  Values get averaged in batches
+first (as in MSER-5), which smooths out op to op noise.  Cuts are
+never past MAX_CUT_FRACTION of a series, so no more data is dropped
+than with the fixed DEFAULT_WARMUP_FRACTION of .5.
+
+Every cut costs a few cumulative sums over its series.
+'''
+
+# Pass as warmup_fraction to readers to choose cuts with MSER.
+AUTO_WARMUP = 'auto'
+
+# Series get averaged into about this many batches, each of at least
+# MIN_BATCH_SIZE values.
+NUM_BATCHES = 1000
+MIN_BATCH_SIZE = 5
+
+MAX_CUT_FRACTION = .5
+
+NS_PER_SECOND = 1000000000.
+
+
+def mser_cut(value_array,batch_size=None):
+    '''
+    @param {numpy.ndarray} value_array --- A series, in time order.
+
+    @param {int or None} batch_size --- Number of successive values to
+    average into each batch.  None to choose one from NUM_BATCHES and
+    MIN_BATCH_SIZE.
+
+    @returns {int} --- Number of leading values to drop: a multiple of
+    batch_size, and at most MAX_CUT_FRACTION of value_array.
+    '''
+    if batch_size is None:
+        batch_size = max(MIN_BATCH_SIZE,len(value_array) // NUM_BATCHES)
+    num_batches = len(value_array) // batch_size
+    if num_batches < 2:
+        return 0
+
+    batch_mean_array = numpy.asarray(
+        value_array[:num_batches * batch_size],
+        dtype=numpy.float64).reshape(num_batches,batch_size).mean(axis=1)
+    # centering keeps the sums of squares below from losing precision
+    batch_mean_array -= batch_mean_array.mean()
+
+    # element d sums over batches d, d+1, ..., num_batches - 1
+    tail_sum_array = numpy.cumsum(batch_mean_array[::-1])[::-1]
+    tail_sum_squares_array = numpy.cumsum(batch_mean_array[::-1] ** 2)[::-1]
+    tail_count_array = numpy.arange(num_batches,0,-1,dtype=numpy.float64)
+    mser_array = (
+        (tail_sum_squares_array - tail_sum_array ** 2 / tail_count_array) /
+        tail_count_array ** 2)
+
+    max_cut = int(num_batches * MAX_CUT_FRACTION)
+    return int(numpy.argmin(mser_array[:max_cut + 1])) * batch_size
+
+
+def timestamp_cut(timestamp_array):
+    '''
+    @param {numpy.ndarray} timestamp_array --- A single switch's ns
+    timestamps, in ascending order.
+
+    @returns {int} --- Number of leading timestamps to drop, chosen
+    from the latencies between successive timestamps.  Dropping d
+    timestamps drops the first d latencies.
+    '''
+    if len(timestamp_array) < 2:
+        return 0
+    return mser_cut(numpy.diff(timestamp_array))
+
+
+def window_start(times):
+    '''
+    @param {list} times --- Each element is an int64 array of a single
+    switch's ns timestamps, in ascending order.
+
+    @returns {2-tuple} (a,b) --- a is the first ns timestamp at which
+    every switch's throughput has reached steady state.  b is a list
+    with the ns, from when the last switch started, at which each
+    switch's throughput reached steady state.
+
+    Throughput is only counted while every switch is running, in
+    NUM_BATCHES bins.
+    '''
+    last_start = max([arr[0] for arr in times])
+    first_end = min([arr[-1] for arr in times])
+    if first_end <= last_start:
+        return last_start, [0 for arr in times]
+
+    bin_edge_array = last_start + (
+        (first_end - last_start) *
+        numpy.arange(NUM_BATCHES + 1,dtype=numpy.float64) / NUM_BATCHES)
+    cut_ns_list = []
+    for arr in times:
+        # ops of the switch in each bin
+        count_array = numpy.diff(numpy.searchsorted(arr,bin_edge_array))
+        cut_bin = mser_cut(count_array,batch_size=1)
+        cut_ns_list.append(int(bin_edge_array[cut_bin] - last_start))
+    return last_start + max(cut_ns_list), cut_ns_list
+
+
+def report_timestamp_cuts(filename,cut_list,length_list):
+    '''
+    Prints the chosen cuts, so that they can be checked, and adds them
+    to the report of the job being recorded (@see
+    util.instrumentation).
+
+    @param {String} filename --- Raw trace the cuts were chosen for.
+
+    @param {list} cut_list --- Number of timestamps dropped from each
+    switch.
+
+    @param {list} length_list --- Number of timestamps each switch
+    had.
+    '''
+    print 'Warmup of %s: dropping first %s of %s timestamps per switch' % (
+        filename,','.join(map(str,cut_list)),','.join(map(str,length_list)))
+    instrumentation.add_detail(
+        'warmup_cut_list',
+        {'filename': filename,'cut_timestamps_list': list(cut_list),
+         'num_timestamps_list': list(length_list)})
+
+
+def report_window_cuts(filename,cut_ns_list,window_length_ns):
+    '''
+    Same as report_timestamp_cuts, for throughput.
+
+    @param {list} cut_ns_list --- @see window_start's b.
+
+    @param {int} window_length_ns --- Length of time during which
+    every switch was running.
+    '''
+    print (
+        'Warmup of %s: dropping first %.3fs of %.3fs; switches steady '
+        'after %ss' % (
+            filename,max(cut_ns_list) / NS_PER_SECOND,
+            window_length_ns / NS_PER_SECOND,
+            ','.join('%.3f' % (cut_ns / NS_PER_SECOND)
+                     for cut_ns in cut_ns_list)))
+    instrumentation.add_detail(
+        'warmup_cut_list',
+        {'filename': filename,'cut_ns_list': list(cut_ns_list),
+         'window_length_ns': int(window_length_ns)})
@@ -0,0 +1,38 @@
+import numpy
+
+class ThroughputSeries(object):
+    '''
+    Time-ordered throughput of every switch in a run, binned at a
+    single sample length.
+    '''
+    def __init__(self,sample_length_seconds,switch_counts):
+        '''
+        @param {float} sample_length_seconds --- Length of each bin.
+
+        @param {numpy.ndarray} switch_counts --- A 2-d int64 array.
+        switch_counts[i][j] is the number of ops that switch i
+        committed in bin j.  Bins are in time order, and only contain
+        complete sample lengths.
+        '''
+        self.sample_length_seconds = sample_length_seconds
+        self.switch_counts = switch_counts
+
+    @property
+    def num_switches(self):
+        return self.switch_counts.shape[0]
+
+    def switch_ops_per_second(self):
+        '''
+        @returns {numpy.ndarray} --- A 2-d float array.  Element [i][j]
+        is switch i's throughput, in ops/s, over bin j.
+        '''
+        return self.switch_counts / float(self.sample_length_seconds)
+
+    def ops_per_second(self):
+        '''
+        @returns {numpy.ndarray} --- Each element is the throughput of
+        all switches combined, in ops/s, over a single bin.  Bins that
+        no op fell into have a throughput of 0.
+        '''
+        return (
+            self.switch_counts.sum(axis=0) / float(self.sample_length_seconds))
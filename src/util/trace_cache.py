@@ -0,0 +1,168 @@
+import os
+
+import numpy
+
+from atomic_output import atomic_open
+import instrumentation
+
+'''
+Binary sidecar cache for raw switch trace files.
+
+Parsing a raw trace is by far the slowest part of producing data, and
+the same traces get parsed on every run.  The first time a trace is
+read, its per-switch timestamps are written next to it in a binary
+sidecar file.  Later reads memory-map the sidecar instead of
+re-parsing the text.
+
+Sidecar layout (every field is a little-endian int64):
+
+    MAGIC, VERSION, source size, source mtime (ns), num switches,
+        num timestamps
+    timestamps: num timestamps entries
+    offsets: num switches + 1 entries
+
+Timestamps for switch i are timestamps[offsets[i]:offsets[i+1]].
+Offsets come last so that a sidecar can be written while a trace is
+still being streamed in.  The sidecar is ignored (and rewritten)
+whenever the size or mtime of the source file changes.
+'''
+
+# Set to False to always parse raw traces.
+ENABLED = True
+
+CACHE_SUFFIX = '.tscache'
+
+# 'SGTSCACH' read as a little-endian int64
+MAGIC = 0x4843414353544753
+VERSION = 2
+
+_DTYPE = numpy.dtype('<i8')
+_HEADER_LENGTH = 6
+
+
+def cache_filename(filename):
+    '''
+    @param {String} filename --- Name of raw trace file.
+
+    @returns {String} --- Name of the sidecar file for filename.
+    '''
+    return filename + CACHE_SUFFIX
+
+
+def is_up_to_date(filename):
+    '''
+    @param {String} filename --- Name of raw trace file.
+
+    @returns {bool} --- True if filename has an up-to-date sidecar,
+    that load would read.  Only the sidecar's header gets read.
+    '''
+    return _map(filename) is not None
+
+
+def load(filename):
+    '''
+    @param {String} filename --- Name of raw trace file.
+
+    @returns {list or None} --- None if there is no up-to-date sidecar
+    for filename.  Otherwise, each element is a read-only int64 array
+    backed by the memory-mapped sidecar, containing the timestamps
+    of a single switch.
+    '''
+    mapped = _map(filename)
+    if mapped is None:
+        return None
+    data, offsets = mapped
+
+    # memory-mapped: pages are read as they are touched
+    instrumentation.count_file_read(cache_filename(filename))
+    return [
+        data[offsets[i]:offsets[i+1]] for i in range(0,len(offsets) - 1)]
+
+
+def _map(filename):
+    '''
+    @returns {2-tuple or None} (a,b) --- None if there is no
+    up-to-date sidecar for filename.  Otherwise, a is the
+    memory-mapped timestamps of every switch, b the memory-mapped
+    offsets into a.
+    '''
+    if not ENABLED:
+        return None
+
+    sidecar = cache_filename(filename)
+    try:
+        source_size, source_mtime_ns = _source_stamp(filename)
+        if os.path.getsize(sidecar) < _HEADER_LENGTH * _DTYPE.itemsize:
+            return None
+        words = numpy.memmap(sidecar,dtype=_DTYPE,mode='r')
+    except (IOError,OSError):
+        return None
+
+    header = words[:_HEADER_LENGTH]
+    if ((header[0] != MAGIC) or (header[1] != VERSION) or
+        (header[2] != source_size) or (header[3] != source_mtime_ns)):
+        return None
+
+    num_switches = int(header[4])
+    num_timestamps = int(header[5])
+    offsets_start = _HEADER_LENGTH + num_timestamps
+    if len(words) != offsets_start + num_switches + 1:
+        return None
+    return words[_HEADER_LENGTH:offsets_start], words[offsets_start:]
+
+
+def store(filename,switch_chunk_iter):
+    '''
+    Write sidecar for filename.  Failing to write the sidecar (eg.,
+    because the trace sits in a read-only directory) is not an error:
+    the trace just gets parsed again next time.
+
+    @param {String} filename --- Name of raw trace file that
+    switch_chunk_iter is parsing.
+
+    @param {iterable} switch_chunk_iter --- Yields (switch index,
+    int64 array) pairs in file order.  @see
+    util.file_readers.iter_switch_chunks.  Chunks are written out as
+    they arrive, so at most one chunk is held in memory.
+
+    @returns {bool} --- True if the sidecar was written.  If False,
+    switch_chunk_iter may have been partially consumed.
+    '''
+    if not ENABLED:
+        return False
+
+    try:
+        source_size, source_mtime_ns = _source_stamp(filename)
+        sidecar = cache_filename(filename)
+        with atomic_open(sidecar,'wb') as sidecar_fd:
+            # header gets rewritten once lengths are known
+            numpy.zeros(_HEADER_LENGTH,dtype=_DTYPE).tofile(sidecar_fd)
+
+            switch_lengths = []
+            for switch_index, chunk in switch_chunk_iter:
+                while len(switch_lengths) <= switch_index:
+                    switch_lengths.append(0)
+                switch_lengths[switch_index] += len(chunk)
+                numpy.asarray(chunk,dtype=_DTYPE).tofile(sidecar_fd)
+
+            offsets = numpy.zeros(len(switch_lengths) + 1,dtype=_DTYPE)
+            numpy.cumsum(switch_lengths,out=offsets[1:])
+            offsets.tofile(sidecar_fd)
+
+            sidecar_fd.seek(0)
+            numpy.array(
+                [MAGIC,VERSION,source_size,source_mtime_ns,
+                 len(switch_lengths),offsets[-1]],
+                dtype=_DTYPE).tofile(sidecar_fd)
+    except (IOError,OSError):
+        return False
+    return True
+
+
+def _source_stamp(filename):
+    '''
+    @returns {2-tuple} (a,b) --- a is the size of filename in bytes, b
+    is its modification time in ns.
+    '''
+    stat_result = os.stat(filename)
+    return stat_result.st_size, int(round(stat_result.st_mtime * 1e9))